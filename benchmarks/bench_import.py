@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmarks (asv style: `asv run --python=same`, or `python -m benchmarks.bench_import`)
+"""
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "transformers", "spacy", "spacy_udpipe", "pdfplumber", "fitz"]
+
+REGEXP_ONLY_IMPORT = "from indonesian_ie import RegexpRulesEntityExtractor"
+
+
+def _run_import(statement):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy_modules': heavy}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+class ImportSuite:
+
+    def timeraw_import_package(self):
+        return "import indonesian_ie"
+
+    def timeraw_import_regexp_extractor(self):
+        return REGEXP_ONLY_IMPORT
+
+    def track_heavy_modules_regexp_extractor(self):
+        # number of heavy modules (torch, transformers, ...) loaded by the regex-only path, must be 0
+        return len(_run_import(REGEXP_ONLY_IMPORT)["heavy_modules"])
+
+    track_heavy_modules_regexp_extractor.unit = "modules"
+
+
+if __name__ == '__main__':
+    for statement in ["import indonesian_ie", REGEXP_ONLY_IMPORT]:
+        result = _run_import(statement)
+        print(f"{statement!r}: {result['elapsed'] * 1000:.1f} ms, heavy modules: {result['heavy_modules']}")
+    assert not _run_import(REGEXP_ONLY_IMPORT)["heavy_modules"], "regex-only path loads heavy modules"
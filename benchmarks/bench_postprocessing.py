@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Post-processing benchmarks of model-backed extractors with stub models: merge of NER
+and rule-based mentions, and generation of mention pairs for relation extraction
+(asv style, or `python -m benchmarks.bench_postprocessing`)
+"""
+import threading
+from types import SimpleNamespace
+
+from indonesian_ie.mention_collection import MentionCollection, iter_pair_indexes
+from indonesian_ie.regexp_extractor import RegexpRulesEntityExtractor
+from indonesian_ie.sentence_splitter import LegalSentenceSplitter
+from indonesian_ie.span_index import filter_contained_spans
+
+from benchmarks.common import (
+    SIZES,
+    StubNerPipeline,
+    make_putusan_text,
+    requires_transformers,
+    run_suites,
+    stub_mentions,
+)
+
+# pair types of the default `RelationsQAExtractor.relations_patterns` (with symmetric ones),
+# the relations module imports transformers, so they are listed here
+QA_PAIR_TYPES = [
+    ("PER", "PER"), ("PER", "LOC"), ("PER", "ORG"), ("LOC", "PER"), ("ORG", "PER"),
+]
+
+
+def _stub_mention_extractor():
+    from indonesian_ie.mentions_extractor import MentionExtractor
+
+    # no model is loaded: the NER pipeline is replaced by the stub
+    extractor = MentionExtractor.__new__(MentionExtractor)
+    extractor.cache = None
+    extractor.window_size = None
+    extractor.batch_size = 8
+    extractor.pipeline = StubNerPipeline()
+    extractor._model_handle = SimpleNamespace(lock=threading.RLock())
+    extractor.rule_based_extractor = RegexpRulesEntityExtractor()
+    return extractor
+
+
+class MentionMergeSuite:
+    params = SIZES
+    param_names = ["paragraphs"]
+
+    def setup(self, paragraphs):
+        self.text = make_putusan_text(paragraphs)
+        self.ner_mentions = stub_mentions(self.text)
+        self.rule_based_mentions = RegexpRulesEntityExtractor()(self.text)
+
+    def time_filter_contained_spans(self, paragraphs):
+        filter_contained_spans(self.rule_based_mentions, self.ner_mentions)
+
+
+class MentionExtractorSuite:
+    params = SIZES
+    param_names = ["paragraphs"]
+
+    def setup(self, paragraphs):
+        requires_transformers()
+        self.text = make_putusan_text(paragraphs)
+        self.extractor = _stub_mention_extractor()
+
+    def time_extract(self, paragraphs):
+        # stub NER, rules, tags mapping and merge of mentions
+        self.extractor(self.text)
+
+
+class PairGenerationSuite:
+    params = [SIZES, [None, 1000]]
+    param_names = ["paragraphs", "max_distance"]
+
+    def setup(self, paragraphs, max_distance):
+        self.text = make_putusan_text(paragraphs)
+        self.mentions = stub_mentions(self.text)
+        self.collection = MentionCollection.from_dicts(self.mentions)
+        self.sentence_starts = [0] + LegalSentenceSplitter().boundaries(self.text)
+
+    def time_iter_pairs(self, paragraphs, max_distance):
+        # pairs of mention dicts, like `RelationsQAExtractor._iter_pairs`
+        collection = MentionCollection.from_dicts(self.mentions)
+        for subject_idx, object_idx in iter_pair_indexes(
+            collection, QA_PAIR_TYPES, max_distance=max_distance
+        ):
+            self.mentions[subject_idx], self.mentions[object_idx]
+
+    def time_iter_pair_indexes(self, paragraphs, max_distance):
+        # pairs of the column-wise collection, without conversion from/to dicts
+        for _ in iter_pair_indexes(self.collection, QA_PAIR_TYPES, max_distance=max_distance):
+            pass
+
+    def time_iter_pairs_sentence_distance(self, paragraphs, max_distance):
+        for _ in iter_pair_indexes(
+            self.collection,
+            QA_PAIR_TYPES,
+            max_distance=max_distance,
+            sentence_starts=self.sentence_starts,
+            max_sentence_distance=1,
+        ):
+            pass
+
+    def track_num_pairs(self, paragraphs, max_distance):
+        return sum(
+            1 for _ in iter_pair_indexes(self.collection, QA_PAIR_TYPES, max_distance=max_distance)
+        )
+
+    track_num_pairs.unit = "pairs"
+
+
+class MentionCollectionSuite:
+    params = SIZES
+    param_names = ["paragraphs"]
+
+    def setup(self, paragraphs):
+        self.mentions = stub_mentions(make_putusan_text(paragraphs))
+        self.collection = MentionCollection.from_dicts(self.mentions)
+
+    def time_from_dicts(self, paragraphs):
+        MentionCollection.from_dicts(self.mentions)
+
+    def time_to_dicts(self, paragraphs):
+        self.collection.to_dicts()
+
+    def time_shift_and_filter(self, paragraphs):
+        self.collection.shift(1000).starting_in(2000, 50000).sorted()
+
+    def peakmem_from_dicts(self, paragraphs):
+        MentionCollection.from_dicts(self.mentions)
+
+
+if __name__ == '__main__':
+    run_suites(
+        MentionMergeSuite, MentionExtractorSuite, PairGenerationSuite, MentionCollectionSuite
+    )
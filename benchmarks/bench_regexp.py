@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rule-based extraction benchmarks on synthetic judgments of increasing size
+(asv style, or `python -m benchmarks.bench_regexp`)
+"""
+from indonesian_ie.regexp_extractor import RegexpRulesEntityExtractor
+
+from benchmarks.common import SIZES, make_putusan_text, run_suites
+
+
+class RegexpExtractorSuite:
+    params = [SIZES, ["compiled", "per_pattern"]]
+    param_names = ["paragraphs", "engine"]
+
+    def setup(self, paragraphs, engine):
+        self.text = make_putusan_text(paragraphs)
+        self.extractor = RegexpRulesEntityExtractor(engine=engine)
+
+    def time_extract(self, paragraphs, engine):
+        self.extractor(self.text)
+
+    def peakmem_extract(self, paragraphs, engine):
+        self.extractor(self.text)
+
+    def track_num_entities(self, paragraphs, engine):
+        # both engines must find the same entities
+        return len(self.extractor(self.text))
+
+    track_num_entities.unit = "entities"
+
+
+class RegexpPostprocessingSuite:
+    params = SIZES
+    param_names = ["paragraphs"]
+
+    def setup(self, paragraphs):
+        self.text = make_putusan_text(paragraphs)
+        self.extractor = RegexpRulesEntityExtractor()
+        self.entities_tree = self.extractor._extract_compiled(self.text)
+        # raw (not merged) matches of every entity type
+        self.raw_entities = {entity_type: [] for entity_type in self.extractor.regex_patterns}
+        for entry, match in self.extractor.compiled_patterns.finditer(self.text):
+            start, end = match.span()
+            if start != end:
+                self.raw_entities[entry.entity_type].append(
+                    {"word": self.text[start:end], "entity_group": entry.entity_type,
+                     "start": start, "end": end}
+                )
+
+    def time_extract_for(self, paragraphs):
+        for entity_type, patterns in self.extractor.regex_patterns.items():
+            self.extractor._extract_for(entity_type, patterns, self.text)
+
+    def time_merge_consecutive_entities(self, paragraphs):
+        # merging mutates entities, so they are copied (copying is a small part of the time)
+        for entities in self.raw_entities.values():
+            self.extractor._merge_consecutive_entities(
+                [dict(entity) for entity in entities], self.text
+            )
+
+    def time_resolve_overlapping_entities(self, paragraphs):
+        self.extractor._resolve_overlapping_entities(self.entities_tree)
+
+
+if __name__ == '__main__':
+    run_suites(RegexpExtractorSuite, RegexpPostprocessingSuite)
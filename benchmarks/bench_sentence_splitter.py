@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sentence splitting benchmarks: `LegalSentenceSplitter` against UDPipe (`MorphSentenceTokenizer`),
+speed and agreement of sentence boundaries (asv style, or `python -m benchmarks.bench_sentence_splitter`)
+
+UDPipe benchmarks are skipped if spacy-udpipe isn't installed.
+"""
+from indonesian_ie.sentence_splitter import LegalSentenceSplitter
+
+SAMPLE_TEXT = """MENGADILI:
+1. Menolak permohonan peninjauan kembali dari Pemohon Peninjauan
+Kembali UMARDANI SUAT;
+2. Menghukum Pemohon Peninjauan Kembali membayar biaya perkara
+pada peninjauan kembali sejumlah Rp2.500.000,00 (dua juta lima ratus
+ribu Rupiah);
+Demikianlah diputuskan dalam rapat permusyawaratan Majelis Hakim
+pada hari Kamis, tanggal 22 Desember 2022, oleh Dr. Irfan Fachruddin, S.H.,
+C.N., Hakim Agung yang ditetapkan oleh Ketua Mahkamah Agung sebagai
+Ketua Majelis, bersama-sama dengan Dr. Cerah Bangun, S.H., M.H. dan Dr.
+H. Yodi Martono Wahyunadi, S.H., M.H., Hakim-Hakim Agung sebagai
+Anggota, dan diucapkan dalam sidang terbuka untuk umum pada hari itu
+juga oleh Ketua Majelis dengan dihadiri Hakim-Hakim Anggota tersebut, dan
+Dewi Asimah, S.H., M.H., Panitera Pengganti tanpa dihadiri oleh para pihak.
+Menimbang, bahwa Undang-Undang Nomor 51 Tahun 2009 berlaku. Pasal 1 jo. Pasal 2
+tidak diterapkan.
+
+"""
+
+# about 100 pages of a judgment
+LONG_TEXT = SAMPLE_TEXT * 100
+
+
+def udpipe_boundaries(tokenizer, text):
+    """
+    Sentence boundaries (starts of sentences except the first one) found by UDPipe
+    """
+    boundaries = []
+    pos = 0
+    for sentence in tokenizer(text):
+        start = text.find(sentence, pos)
+        if start < 0:
+            continue
+        if start > 0:
+            boundaries.append(start)
+        pos = start + len(sentence)
+    return boundaries
+
+
+def boundary_f1(boundaries, reference_boundaries, text):
+    """
+    F1 of boundaries against reference ones, boundaries are compared ignoring whitespaces
+    """
+    def normalize(offsets):
+        normalized = set()
+        for offset in offsets:
+            while offset < len(text) and text[offset].isspace():
+                offset += 1
+            normalized.add(offset)
+        return normalized
+
+    boundaries, reference_boundaries = normalize(boundaries), normalize(reference_boundaries)
+    if not boundaries and not reference_boundaries:
+        return 1.0
+    true_positives = len(boundaries & reference_boundaries)
+    return 2 * true_positives / (len(boundaries) + len(reference_boundaries))
+
+
+def _udpipe_tokenizer():
+    try:
+        from indonesian_ie.morph_sentence_tokenizer import MorphSentenceTokenizer
+
+        return MorphSentenceTokenizer(mode="sentence")
+    except ImportError:
+        # asv skips benchmarks raising NotImplementedError in setup
+        raise NotImplementedError("spacy-udpipe isn't installed")
+
+
+class RuleBasedSplitterSuite:
+
+    def setup(self):
+        self.splitter = LegalSentenceSplitter()
+
+    def time_spans_sample(self):
+        self.splitter.spans(SAMPLE_TEXT)
+
+    def time_spans_long_text(self):
+        self.splitter.spans(LONG_TEXT)
+
+
+class UDPipeSplitterSuite:
+    timeout = 600
+
+    def setup(self):
+        self.tokenizer = _udpipe_tokenizer()
+        self.splitter = LegalSentenceSplitter()
+
+    def time_udpipe_sample(self):
+        self.tokenizer(SAMPLE_TEXT)
+
+    def time_udpipe_long_text(self):
+        self.tokenizer(LONG_TEXT)
+
+    def track_boundary_agreement(self):
+        # F1 of rule-based boundaries against UDPipe ones
+        return boundary_f1(
+            self.splitter.boundaries(SAMPLE_TEXT),
+            udpipe_boundaries(self.tokenizer, SAMPLE_TEXT),
+            SAMPLE_TEXT,
+        )
+
+    track_boundary_agreement.unit = "F1"
+
+
+if __name__ == '__main__':
+    import timeit
+
+    splitter = LegalSentenceSplitter()
+    number = 20
+    elapsed = timeit.timeit(lambda: splitter.spans(LONG_TEXT), number=number) / number
+    print(f"rule-based: {elapsed * 1000:.2f} ms for {len(LONG_TEXT)} chars, "
+          f"{elapsed / len(LONG_TEXT) * 1e9:.0f} ns/char")
+    try:
+        tokenizer = _udpipe_tokenizer()
+    except NotImplementedError as e:
+        print(f"udpipe: skipped, {e}")
+    else:
+        elapsed = timeit.timeit(lambda: tokenizer(LONG_TEXT), number=1)
+        print(f"udpipe: {elapsed * 1000:.2f} ms for {len(LONG_TEXT)} chars")
+        reference = udpipe_boundaries(tokenizer, SAMPLE_TEXT)
+        print(f"boundary agreement (F1): "
+              f"{boundary_f1(splitter.boundaries(SAMPLE_TEXT), reference, SAMPLE_TEXT):.3f}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic putusan-like texts, stub models and a minimal runner of asv-style suites,
+benchmarks run offline and never download models
+"""
+import itertools
+import random
+import re
+import timeit
+
+# number of paragraphs of synthetic documents, a paragraph is about 600 characters
+SIZES = [10, 100, 1000]
+
+_NAMES = [
+    "Dr. Irfan Fachruddin, S.H., C.N.", "Dr. Cerah Bangun, S.H., M.H.",
+    "Dr. H. Yodi Martono Wahyunadi, S.H., M.H.", "Dewi Asimah, S.H., M.H.",
+    "Umardani Suat", "Raja Purnawarman", "Siti Rahmawati", "Budi Santoso",
+]
+_ORGS = [
+    "Mahkamah Agung", "Pengadilan Tata Usaha Negara Jakarta", "Universitas Indonesia",
+    "Kejaksaan Negeri Surabaya", "PT Bank Rakyat Indonesia Tbk",
+]
+_LOCS = ["Jakarta", "Surabaya", "Bandung", "Medan", "Makassar"]
+_MONTHS = ["Januari", "Maret", "Juni", "Agustus", "Oktober", "Desember"]
+_TEMPLATES = [
+    "Demikianlah diputuskan dalam rapat permusyawaratan Majelis Hakim pada hari Kamis, "
+    "tanggal {day} {month} {year}, oleh {name}, Hakim Agung yang ditetapkan oleh Ketua {org} "
+    "sebagai Ketua Majelis, bersama-sama dengan {name2} sebagai Anggota.",
+    "Menimbang, bahwa Penggugat {name} bertempat tinggal di {loc}, nomor telepon {phone}, "
+    "email {email}, telah mengajukan gugatan pada tanggal {date} terhadap {org};",
+    "Menghukum Pemohon Peninjauan Kembali membayar biaya perkara sejumlah Rp{money},00 "
+    "(dua juta lima ratus ribu Rupiah) sesuai putusan Nomor {case} K/TUN/{year} tanggal {date}.",
+    "Bahwa informasi perkara dapat diakses di https://putusan3.mahkamahagung.go.id/{case} "
+    "dan www.{loc_lower}.go.id/perkara/{case}, diunggah pukul {time} oleh {org}.",
+]
+
+
+def make_putusan_text(num_paragraphs: int, seed: int = 0) -> str:
+    """
+    Deterministic synthetic judgment with names, degrees, organizations, dates, phones,
+    emails, money, case numbers and URLs
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    for idx in range(num_paragraphs):
+        loc = rng.choice(_LOCS)
+        paragraphs.append(rng.choice(_TEMPLATES).format(
+            day=rng.randint(1, 28),
+            month=rng.choice(_MONTHS),
+            year=rng.randint(1995, 2023),
+            date=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1995, 2023)}",
+            time=f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            name=rng.choice(_NAMES),
+            name2=rng.choice(_NAMES),
+            org=rng.choice(_ORGS),
+            loc=loc,
+            loc_lower=loc.lower(),
+            phone="08" + "".join(str(rng.randint(0, 9)) for _ in range(9)),
+            email=f"pihak{idx}@mail.com",
+            money=f"{rng.randint(1, 999)}.{rng.randint(0, 999):03d}.000",
+            case=rng.randint(1, 9999),
+        ))
+    return "\n".join(paragraphs)
+
+
+_CAPITALIZED_RE = re.compile(r"[A-Z][a-z]+(?: [A-Z][a-z]+)*")
+
+
+class StubNerPipeline:
+    """
+    Stands for `NerPipeline`: capitalized word sequences are mentions,
+    entity type depends on the words, so results are deterministic
+    """
+    entity_groups = ["PER", "ORG", "LOC", "DAT", "GPE"]
+
+    def _predict(self, text):
+        return [
+            {
+                "entity_group": self.entity_groups[len(match.group()) % len(self.entity_groups)],
+                "score": 0.99,
+                "word": match.group(),
+                "start": match.start(),
+                "end": match.end(),
+            }
+            for match in _CAPITALIZED_RE.finditer(text)
+        ]
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        if isinstance(inputs, str):
+            return self._predict(inputs)
+        return [self._predict(text) for text in inputs]
+
+
+def stub_mentions(text: str) -> list:
+    """
+    Mentions of text as `MentionExtractor` returns them (after tags mapping)
+    """
+    tags_mapping = {"DAT": "DATE", "GPE": "LOC"}
+    mentions = StubNerPipeline()(text)
+    for mention in mentions:
+        mention["entity_group"] = tags_mapping.get(mention["entity_group"], mention["entity_group"])
+    return mentions
+
+
+def requires_transformers():
+    """
+    Called in `setup` of suites importing model-backed modules, asv skips benchmarks
+    raising NotImplementedError in setup
+    """
+    try:
+        import transformers  # noqa: F401
+    except ImportError:
+        raise NotImplementedError("transformers isn't installed")
+
+
+def run_suites(*suites, number=3):
+    """
+    Runs time_* benchmarks of asv-style suites for all their params and prints timings
+    """
+    for suite_cls in suites:
+        params = getattr(suite_cls, "params", [])
+        if params and not isinstance(params[0], list):
+            params = [params]
+        for param in itertools.product(*params):
+            suite = suite_cls()
+            try:
+                if hasattr(suite, "setup"):
+                    suite.setup(*param)
+            except NotImplementedError as e:
+                print(f"{suite_cls.__name__}{param}: skipped, {e}")
+                break
+            for name in sorted(dir(suite)):
+                if name.startswith("time_"):
+                    elapsed = timeit.timeit(
+                        lambda: getattr(suite, name)(*param), number=number
+                    ) / number
+                    print(f"{suite_cls.__name__}.{name}{param}: {elapsed * 1000:.2f} ms")
@@ -1,10 +1,56 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from indonesian_ie.extractive_qa_extractor import ExtractiveQAExtractor
-from indonesian_ie.mentions_extractor import MentionExtractor
-from indonesian_ie.relations_extractor import RelationsQAExtractor, RelationsNLIExtractor
-from indonesian_ie.regexp_extractor import RegexpRulesEntityExtractor
-from indonesian_ie.nli_reranker import CrossEncoderEntailmentReranker
-from indonesian_ie.morph_sentence_tokenizer import MorphSentenceTokenizer
+# extractors are imported lazily on the first access, so e.g. importing
+# `RegexpRulesEntityExtractor` doesn't pull torch and transformers
+import importlib
+from typing import TYPE_CHECKING
 
 __version__ = "0.0.1"
+
+_LAZY_ATTRIBUTES = {
+    "DictExtractor": "indonesian_ie.dict_extractor",
+    "DocumentPipeline": "indonesian_ie.document_pipeline",
+    "MentionCollection": "indonesian_ie.mention_collection",
+    "LegalSentenceSplitter": "indonesian_ie.sentence_splitter",
+    "ExtractiveQAExtractor": "indonesian_ie.extractive_qa_extractor",
+    "MentionExtractor": "indonesian_ie.mentions_extractor",
+    "RelationsQAExtractor": "indonesian_ie.relations_extractor",
+    "RelationsNLIExtractor": "indonesian_ie.relations_extractor",
+    "RegexpRulesEntityExtractor": "indonesian_ie.regexp_extractor",
+    "CrossEncoderEntailmentReranker": "indonesian_ie.nli_reranker",
+    "MorphSentenceTokenizer": "indonesian_ie.morph_sentence_tokenizer",
+    "ResultCache": "indonesian_ie.result_cache",
+    "Instrumentation": "indonesian_ie.instrumentation",
+    "InferenceServer": "indonesian_ie.serving",
+    "MicroBatcher": "indonesian_ie.serving",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from indonesian_ie.dict_extractor import DictExtractor
+    from indonesian_ie.document_pipeline import DocumentPipeline
+    from indonesian_ie.mention_collection import MentionCollection
+    from indonesian_ie.sentence_splitter import LegalSentenceSplitter
+    from indonesian_ie.extractive_qa_extractor import ExtractiveQAExtractor
+    from indonesian_ie.mentions_extractor import MentionExtractor
+    from indonesian_ie.relations_extractor import RelationsQAExtractor, RelationsNLIExtractor
+    from indonesian_ie.regexp_extractor import RegexpRulesEntityExtractor
+    from indonesian_ie.nli_reranker import CrossEncoderEntailmentReranker
+    from indonesian_ie.morph_sentence_tokenizer import MorphSentenceTokenizer
+    from indonesian_ie.result_cache import ResultCache
+    from indonesian_ie.instrumentation import Instrumentation
+    from indonesian_ie.serving import InferenceServer, MicroBatcher
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name])
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import pickle
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Iterable, Iterator, Tuple
+
+
+def _normalize_char(char):
+    lower_char = char.lower()
+    return lower_char if len(lower_char) == 1 else char
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercases text and collapses runs of whitespaces into a single space
+    """
+    return " ".join("".join(_normalize_char(char) for char in text).split())
+
+
+class AhoCorasickAutomaton:
+    """
+    Aho-Corasick automaton over normalized (see `normalize`) keys
+
+    The trie is stored in flat arrays in CSR layout: edges of node `i` are
+    `_first_edge[i]:_first_edge[i + 1]`, stored contiguously and sorted by label,
+    `_edge_target` maps an edge to the node it leads to, so a transition is a binary search
+    over the edges of the node. Together with failure
+    and dictionary links it makes matching linear in the text length whatever number
+    of keys is. Arrays are pickled as raw bytes, so a large gazetteer loads fast.
+
+    `fingerprint` is a hash of keys and values, it's saved with the automaton
+    and identifies its content (e.g. in cache keys).
+    """
+
+    def __init__(self, items: Iterable[Tuple[str, Any]] = ()):
+        """
+        Args:
+            items (list): List of (key, value), for duplicated keys (after normalization)
+                the first value is kept
+        """
+        self.values = []
+        keys = {}
+        for key, value in items:
+            key = normalize(key)
+            if key and key not in keys:
+                keys[key] = len(self.values)
+                self.values.append(value)
+        sorted_items = sorted(keys.items())
+        digest = hashlib.sha256()
+        for key, value_idx in sorted_items:
+            digest.update(repr((key, self.values[value_idx])).encode("utf-8"))
+        self.fingerprint = digest.hexdigest()
+        self._build(sorted_items)
+
+    def _build(self, sorted_items):
+        # trie nodes are created in depth-first order from sorted keys,
+        # so children of a node are created in order of their labels
+        parent = array("i", [-1])
+        label = array("i", [-1])
+        depth = array("i", [0])
+        self._term = array("i", [-1])
+        path = [0]
+        prev_key = ""
+        for key, value_idx in sorted_items:
+            common = 0
+            while common < min(len(key), len(prev_key)) and key[common] == prev_key[common]:
+                common += 1
+            del path[common + 1:]
+            for char in key[common:]:
+                node = len(parent)
+                parent.append(path[-1])
+                label.append(ord(char))
+                depth.append(len(path))
+                self._term.append(-1)
+                path.append(node)
+            self._term[path[-1]] = value_idx
+            prev_key = key
+        num_nodes = len(parent)
+        self._depth = depth
+        self._max_depth = max(depth)
+
+        # edges sorted by parent (counting sort keeps the order of labels)
+        self._first_edge = array("i", [0] * (num_nodes + 1))
+        for node in range(1, num_nodes):
+            self._first_edge[parent[node] + 1] += 1
+        for node in range(num_nodes):
+            self._first_edge[node + 1] += self._first_edge[node]
+        self._edge_label = array("i", [0] * (num_nodes - 1))
+        self._edge_target = array("i", [0] * (num_nodes - 1))
+        fill = array("i", self._first_edge[:-1])
+        for node in range(1, num_nodes):
+            edge = fill[parent[node]]
+            fill[parent[node]] += 1
+            self._edge_label[edge] = label[node]
+            self._edge_target[edge] = node
+
+        # failure links and dictionary links (nearest terminal node on the failure chain)
+        self._fail = array("i", [0] * num_nodes)
+        self._dict_link = array("i", [0] * num_nodes)
+        queue = deque(self._children(0))
+        while queue:
+            node = queue.popleft()
+            for child in self._children(node):
+                fail = self._fail[node]
+                char = label[child]
+                while True:
+                    target = self._goto(fail, char)
+                    if target >= 0 or fail == 0:
+                        break
+                    fail = self._fail[fail]
+                fail = target if target >= 0 else 0
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._term[fail] >= 0 else self._dict_link[fail]
+                queue.append(child)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _children(self, node):
+        return self._edge_target[self._first_edge[node] : self._first_edge[node + 1]]
+
+    def _goto(self, node, char):
+        lo, hi = self._first_edge[node], self._first_edge[node + 1]
+        idx = bisect_left(self._edge_label, char, lo, hi)
+        if idx < hi and self._edge_label[idx] == char:
+            return self._edge_target[idx]
+        return -1
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Finds all (possibly overlapping) occurrences of keys in text, text is normalized
+        on the fly, so offsets refer to the original text
+        Args:
+            text (str): Text to search in
+        Returns:
+            iterator of (start, end, value)
+        """
+        # original offsets of the last normalized chars
+        positions = deque(maxlen=self._max_depth or 1)
+        term, fail, dict_link, depth = self._term, self._fail, self._dict_link, self._depth
+        goto = self._goto
+        node = 0
+        prev_space = True
+        for pos, char in enumerate(text):
+            if char.isspace():
+                if prev_space:
+                    continue
+                prev_space = True
+                char = " "
+            else:
+                prev_space = False
+                char = _normalize_char(char)
+            positions.append(pos)
+            code = ord(char)
+            while True:
+                target = goto(node, code)
+                if target >= 0:
+                    node = target
+                    break
+                if node == 0:
+                    break
+                node = fail[node]
+            match = node if term[node] >= 0 else dict_link[node]
+            while match > 0:
+                yield positions[-depth[match]], pos + 1, self.values[term[match]]
+                match = dict_link[match]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path) -> "AhoCorasickAutomaton":
+        with open(path, "rb") as f:
+            automaton = pickle.load(f)
+        assert isinstance(automaton, cls)
+        return automaton
@@ -1,12 +1,101 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import inspect
+import time
+import types
+
+from indonesian_ie.instrumentation import NULL_INSTRUMENTATION, get_instrumentation
+
+_MISSING = object()
+
+
 class BaseExtractor:
+    # names of attributes which change results, they are a part of the cache key
+    cache_fields = ()
+    instrumentation = NULL_INSTRUMENTATION
 
-    def __init__(self, **kwargs):
-        pass
+    def __init__(self, cache=None, instrumentation=None, **kwargs):
+        """
+        Args:
+            cache (ResultCache): If set, results are cached by the content of inputs
+                and extractor config (see `cache_fields`)
+            instrumentation (Instrumentation): If set, timings of stages and counters
+                are collected into it (see `indonesian_ie.instrumentation`)
+        """
+        self.cache = cache
+        self.instrumentation = get_instrumentation(instrumentation)
 
     def _extract(self, text, *args, **kwargs):
         pass
 
     def __call__(self, *args, **kwargs):
-        return self._extract(*args, **kwargs)
+        if not self.instrumentation.enabled:
+            return self._call(*args, **kwargs)
+        stage = f"extract.{type(self).__name__}"
+        if not inspect.isgeneratorfunction(self._extract):
+            with self.instrumentation.stage(stage):
+                return self._call(*args, **kwargs)
+        # items of generator extractors are produced while the generator is consumed,
+        # so the stage is timed over its iteration
+        start = time.perf_counter()
+        result = self._call(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        if isinstance(result, types.GeneratorType):
+            return self._timed_generator(stage, result, elapsed)
+        # cached result
+        self.instrumentation.record(stage, elapsed)
+        return result
+
+    def _timed_generator(self, stage, generator, elapsed=0.0):
+        """
+        Yields items of generator and records time spent producing them as one run of the stage
+        (time of the consumer between items isn't counted)
+        """
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            generator.close()
+            self.instrumentation.record(stage, elapsed)
+
+    def _call(self, *args, **kwargs):
+        if self.cache is None:
+            return self._extract(*args, **kwargs)
+
+        key = self.cache_key(*args, **kwargs)
+        result = self.cache.get(key, _MISSING)
+        if result is _MISSING:
+            self.instrumentation.count("cache_misses")
+            result = self._extract(*args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                result = list(result)
+            self.cache.put(key, result)
+        else:
+            self.instrumentation.count("cache_hits")
+        return result
+
+    def cache_config(self):
+        return {field: getattr(self, field, None) for field in self.cache_fields}
+
+    def _cache_inputs(self, *args, **kwargs):
+        return args, sorted(kwargs.items())
+
+    def cache_key(self, *args, **kwargs):
+        """
+        Key of results for inputs: hash of inputs content, extractor class, config and package version
+        """
+        from indonesian_ie import __version__
+
+        return self.cache.make_key(
+            __version__,
+            f"{type(self).__module__}.{type(self).__qualname__}",
+            sorted(self.cache_config().items()),
+            self._cache_inputs(*args, **kwargs),
+        )
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-# TODO: Implement it, e.g. getting data from wikidata
+# TODO: getting data from wikidata
+from typing import Dict, Optional, Union
+
+from indonesian_ie.aho_corasick import AhoCorasickAutomaton
 from indonesian_ie.base_extractor import BaseExtractor
+from indonesian_ie.span_index import resolve_overlapping_spans
 
 person_suffixes = [
     "menyatakan",
@@ -16,16 +20,102 @@ person_suffixes = [
     "S.H.",
 ]
 
+DEFAULT_DICTIONARY = {
+    "PER_SUFFIX": person_suffixes,
+}
+
 
 class DictExtractor(BaseExtractor):
     """
     Extracts entities from text using a dictionary of entities and their synonyms
-    using dictionary-trie data structure
+    using Aho-Corasick automaton (see `AhoCorasickAutomaton`), matching is case-insensitive,
+    ignores differences in whitespaces and is linear in the text length whatever the size
+    of the dictionary is
     """
+    cache_fields = ("automaton_fingerprint", "word_boundaries")
 
-    def __init__(self, **kwargs):
+    def __init__(
+        self,
+        dictionary: Optional[Dict[str, Union[list, dict]]] = None,
+        automaton_path: Optional[str] = None,
+        word_boundaries: bool = True,
+        **kwargs
+    ):
+        """
+        Args:
+            dictionary (dict): Dict where key is the entity type and value is either a list of names
+                or a dict of canonical names and lists of their synonyms, `DEFAULT_DICTIONARY` by default
+            automaton_path (str): Path to automaton saved by `save`, it's used instead of dictionary
+            word_boundaries (bool): If True, names are matched only as whole words
+        """
         super().__init__(**kwargs)
-        self._dictionary = kwargs.get("dictionary", {})
+        self.word_boundaries = word_boundaries
+        if automaton_path:
+            self.automaton = AhoCorasickAutomaton.load(automaton_path)
+        else:
+            self.automaton = AhoCorasickAutomaton(
+                self._iter_dictionary(DEFAULT_DICTIONARY if dictionary is None else dictionary)
+            )
+        self.automaton_fingerprint = self.automaton.fingerprint
+
+    def _iter_dictionary(self, dictionary):
+        for entity_type, names in dictionary.items():
+            if isinstance(names, dict):
+                for canonical, synonyms in names.items():
+                    yield canonical, (entity_type, canonical)
+                    for synonym in synonyms:
+                        yield synonym, (entity_type, canonical)
+            else:
+                for name in names:
+                    yield name, (entity_type, name)
+
+    def save(self, path):
+        """
+        Saves the automaton, so it can be loaded with `DictExtractor(automaton_path=path)`
+        """
+        self.automaton.save(path)
+
+    def _is_word(self, text, start, end):
+        if start > 0 and text[start].isalnum() and text[start - 1].isalnum():
+            return False
+        if end < len(text) and text[end - 1].isalnum() and text[end].isalnum():
+            return False
+        return True
 
     def _extract(self, text, *args, **kwargs):
-        pass
+        """
+        Extracts entities from text, overlapping matches are resolved in favor of the longest one
+        Args:
+            text (str): Text to extract entities from
+        Returns:
+            entities (list): List of entities
+        """
+        entities = []
+        with self.instrumentation.stage("dict.scan"):
+            for start, end, (entity_type, canonical) in self.automaton.iter(text):
+                if self.word_boundaries and not self._is_word(text, start, end):
+                    continue
+                entities.append(
+                    {"word": text[start:end],
+                     "entity_group": entity_type,
+                     "start": start,
+                     "end": end,
+                     "canonical": canonical}
+                )
+        with self.instrumentation.stage("dict.resolve"):
+            entities = resolve_overlapping_spans(
+                entities, priority_fn=lambda x: x["end"] - x["start"], touching=False
+            )
+        self.instrumentation.count("entities", len(entities))
+        return entities
+
+
+if __name__ == '__main__':
+    extractor = DictExtractor(
+        dictionary={
+            "PER": {"Irfan Fachruddin": ["Dr. Irfan Fachruddin"]},
+            "ORG": ["Mahkamah Agung"],
+            "PER_SUFFIX": person_suffixes,
+        }
+    )
+    print(extractor("oleh Dr.  Irfan Fachruddin, S.H., C.N., Hakim Agung yang ditetapkan oleh Ketua MAHKAMAH\nAgung"))
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming document pipeline: pages -> text cleanup -> mentions -> relations
+
+Stages run concurrently and are connected by bounded queues, so a slow stage stops the previous
+ones (backpressure) and at most a few pages are held in memory whatever the document size is.
+Pages are processed as overlapping segments, an entity broken by a page break is found whole
+in the overlap, and relations are yielded as soon as mentions of a segment are paired.
+"""
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from indonesian_ie.mention_collection import MentionCollection
+from indonesian_ie.pdf2text_extractor import Pdf2TextExtractor, _submit_bounded
+from indonesian_ie.relations_extractor import RelationsNLIExtractor
+
+_PAGE_FOOTER_RE = re.compile(r"^[ \t]*Halaman \d+ dari \d+.*$\n?", re.MULTILINE)
+
+_DONE = object()
+
+
+def clean_page_text(text: str) -> str:
+    """
+    Removes "Halaman X dari Y ..." page footers and surrounding whitespaces of the page
+    """
+    return _PAGE_FOOTER_RE.sub("", text or "").strip()
+
+
+class Segment(NamedTuple):
+    # index of the segment in the document
+    index: int
+    # number of the last page of the segment
+    page_num: int
+    # offset of the segment in the document text
+    start: int
+    text: str
+    # mentions starting in [own_start, own_end) belong to the segment
+    own_start: int
+    own_end: int
+
+
+def _put(items, item, stop):
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Runs iterable in a background thread and yields its items through a queue of maxsize items,
+    so the thread is blocked when the consumer lags behind
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def produce():
+        error = None
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not _put(items, (item, None), stop):
+                    return
+        except BaseException as e:
+            error = e
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        _put(items, (_DONE, error), stop)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _parallel_map(fn: Callable, iterable: Iterable, n_workers: int, max_pending: int) -> Iterator:
+    """
+    Ordered map running at most max_pending calls of fn in n_workers threads
+    """
+    if n_workers <= 1:
+        yield from map(fn, iterable)
+        return
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        yield from _submit_bounded(executor, fn, ((item,) for item in iterable), max_pending)
+
+
+class DocumentPipeline:
+    """
+    Extracts relations from PDF file page by page
+
+    Mentions are paired with mentions at most `max_distance` characters back, the document
+    isn't kept whole, so `max_sentence_distance` of relations_extractor isn't applied.
+
+    Usage:
+        pipeline = DocumentPipeline()
+        for relation in pipeline("putusan.pdf"):
+            print(relation)
+    """
+
+    def __init__(
+        self,
+        pdf_extractor: Optional[Callable] = None,
+        relations_extractor=None,
+        mentions_extractor=None,
+        cleanup_fn: Callable[[str], str] = clean_page_text,
+        overlap: int = 200,
+        max_distance: int = 1000,
+        context_size: int = 500,
+        queue_size: int = 4,
+        ner_workers: int = 1,
+        relations_workers: int = 1,
+    ):
+        """
+        Args:
+            pdf_extractor (callable): Yields (page_num, text) for a file,
+                `Pdf2TextExtractor("pdfplumber")` by default
+            relations_extractor (RelationsQAExtractor): Relations extractor,
+                `RelationsNLIExtractor` with batched scoring by default
+            mentions_extractor (MentionExtractor): Mentions extractor, the one of
+                relations_extractor by default
+            cleanup_fn (callable): Cleans up text of a page
+            overlap (int): Number of characters shared by consecutive segments, entities
+                shorter than overlap / 2 broken by a page break are found whole
+            max_distance (int): Maximal distance in characters between mentions of a relation
+                (unless relations_extractor has a smaller one), mentions further back are dropped
+            context_size (int): Number of characters around mentions of a segment passed
+                as the context (premise) to relations_extractor
+            queue_size (int): Maximal number of items waiting between stages
+            ner_workers (int): Number of threads extracting mentions of segments, the extractor
+                serializes its model calls (see `ModelHandle`), so workers overlap rule-based
+                extraction, conversion and filtering of mentions with NER
+            relations_workers (int): Number of threads extracting relations of segments, model
+                calls of relations_extractor are serialized by its extractors as well
+        """
+        self.pdf_extractor = pdf_extractor or Pdf2TextExtractor("pdfplumber")
+        self.relations_extractor = relations_extractor or RelationsNLIExtractor(batch_size=32)
+        self.mentions_extractor = mentions_extractor or self.relations_extractor.mentions_extractor
+        self.cleanup_fn = cleanup_fn
+        self.overlap = overlap
+        self.max_distance = max_distance
+        if self.relations_extractor.max_distance is not None:
+            self.max_distance = min(self.max_distance, self.relations_extractor.max_distance)
+        self.context_size = context_size
+        self.queue_size = queue_size
+        self.ner_workers = ner_workers
+        self.relations_workers = relations_workers
+
+    def __call__(self, input_file) -> Iterator[dict]:
+        return self.iter_relations(input_file)
+
+    def iter_segments(self, input_file) -> Iterator[Segment]:
+        """
+        Yields overlapping segments of the document text, one per page plus the last overlap.
+        The overlap of two segments is owned half by one and half by another, so every
+        mention is kept only once.
+        """
+        offset = 0
+        tail = ""
+        own_start = 0
+        index = 0
+        page_num = 0
+        for page_num, text in self.pdf_extractor(input_file):
+            text = self.cleanup_fn(text)
+            if not text:
+                continue
+            if offset:
+                text = "\n" + text
+            segment_text = tail + text
+            offset += len(text)
+            tail = segment_text[-self.overlap:] if self.overlap else ""
+            own_end = offset - len(tail) // 2
+            yield Segment(
+                index, page_num, offset - len(segment_text), segment_text, own_start, own_end
+            )
+            own_start = own_end
+            index += 1
+        if tail:
+            yield Segment(index, page_num, offset - len(tail), tail, own_start, offset)
+
+    def _segment_mentions(self, segment):
+        mentions = self.mentions_extractor(segment.text)
+        mentions = MentionCollection.from_dicts(mentions)
+        owned = mentions.shift(segment.start).starting_in(segment.own_start, segment.own_end)
+        return segment, owned.sorted()
+
+    def _iter_segments_mentions(self, input_file):
+        segments = _prefetch(self.iter_segments(input_file), self.queue_size)
+        return _prefetch(
+            _parallel_map(self._segment_mentions, segments, self.ner_workers, self.queue_size),
+            self.queue_size,
+        )
+
+    def iter_mentions(self, input_file) -> Iterator[dict]:
+        """
+        Yields mentions of the document, offsets refer to the whole (cleaned up) document text
+        """
+        for _, mentions in self._iter_segments_mentions(input_file):
+            yield from mentions.to_dicts()
+
+    def _iter_pairs(self, segments_mentions):
+        """
+        Pairs mentions of every segment with each other and with recent mentions
+        of previous segments, yields (pairs, context, context offset) per segment
+        """
+        history = MentionCollection()
+        text, text_start = "", 0
+        for segment, mentions in segments_mentions:
+            # text of the document from text_start up to the end of the segment
+            text += segment.text[text_start + len(text) - segment.start:]
+            history = history.ending_from(segment.own_start - self.max_distance)
+            if len(mentions):
+                candidates = MentionCollection.concat([history, mentions])
+                # mentions of the segment are paired with each other and with the history
+                pair_indexes = list(self.relations_extractor.iter_pair_indexes(
+                    candidates, max_distance=self.max_distance, new_from=len(history)
+                ))
+                if pair_indexes:
+                    # mentions are converted to dicts only for pairs passed to relations_extractor
+                    paired_indexes = list(dict.fromkeys(
+                        idx for pair in pair_indexes for idx in pair
+                    ))
+                    paired_mentions = candidates.take(paired_indexes)
+                    paired = dict(zip(paired_indexes, paired_mentions))
+                    pairs = [(paired[subject], paired[object]) for subject, object in pair_indexes]
+                    first_start, last_end = paired_mentions.span()
+                    context_start = max(first_start - self.context_size, text_start)
+                    context_end = last_end + self.context_size
+                    yield pairs, text[context_start - text_start : context_end - text_start]
+                history = candidates
+
+            # keep only text which can be a context of future pairs
+            history_start = history.span()[0] if len(history) else segment.own_start
+            new_text_start = max(
+                min(segment.own_start, history_start) - self.context_size, text_start
+            )
+            text = text[new_text_start - text_start:]
+            text_start = new_text_start
+
+    def _pairs_relations(self, pairs_context):
+        pairs, context = pairs_context
+        return self.relations_extractor.from_pairs(pairs, context)
+
+    def iter_relations(self, input_file) -> Iterator[dict]:
+        """
+        Yields relations of the document as soon as mentions of their segment are extracted
+        """
+        pairs = self._iter_pairs(self._iter_segments_mentions(input_file))
+        for relations in _parallel_map(
+            self._pairs_relations, pairs, self.relations_workers, self.queue_size
+        ):
+            yield from relations
+
+
+if __name__ == '__main__':
+    import sys
+    from pprint import pprint
+
+    pipeline = DocumentPipeline()
+    for relation in pipeline(sys.argv[1]):
+        pprint(relation)
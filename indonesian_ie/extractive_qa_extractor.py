@@ -1,28 +1,164 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from transformers import AutoModelForQuestionAnswering, AutoTokenizer, QuestionAnsweringPipeline
+import torch
+from transformers import AutoModelForQuestionAnswering, QuestionAnsweringPipeline
 
 from indonesian_ie.base_extractor import BaseExtractor
+from indonesian_ie.model_registry import get_model_registry
 
 
 class ExtractiveQAExtractor(BaseExtractor):
+    cache_fields = ("model_name", "quantization")
 
-    def __init__(self, model_name='bstds/id-extractive-bert-squad', **kwargs):
+    def __init__(self, model_name='bstds/id-extractive-bert-squad', quantization=None, **kwargs):
         super().__init__(**kwargs)
-        self.model = AutoModelForQuestionAnswering.from_pretrained(model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model_name = model_name
+        self.quantization = quantization
+        # weights are shared with other extractors using the same model
+        self._model_handle = get_model_registry().acquire(
+            AutoModelForQuestionAnswering, model_name, quantization=quantization
+        )
+        self.model = self._model_handle.model
+        self.tokenizer = self._model_handle.tokenizer
 
         self.qa_pipeline = QuestionAnsweringPipeline(
             model=self.model, tokenizer=self.tokenizer
         )
 
     def __call__(self, question, context, **kwargs):
-        return self._extract(question, context, **kwargs)
+        return super().__call__(question, context, **kwargs)
 
     def _extract(self, question, context, **kwargs):
-        answer = self.qa_pipeline({'question': question, 'context': context})
+        with self._model_handle.lock:
+            answer = self.qa_pipeline({'question': question, 'context': context})
         return answer
 
+    @torch.inference_mode()
+    def extract_many(
+        self,
+        questions,
+        context,
+        batch_size=32,
+        max_length=384,
+        doc_stride=128,
+        max_question_length=64,
+        max_answer_length=30,
+    ):
+        """
+        Answers many questions about the same context. The context is tokenized and split
+        into overlapping windows only once, question/window rows of all questions are run
+        in length-sorted batches and the best span across windows is picked per question
+        Args:
+            questions (list): List of questions
+            context (str): Context shared by all questions
+            batch_size (int): Number of question/window rows per forward pass
+            max_length (int): Maximal number of tokens of a row
+            doc_stride (int): Overlap of consecutive context windows in tokens
+            max_question_length (int): Questions are truncated to this number of tokens
+            max_answer_length (int): Maximal number of tokens of an answer
+        Returns:
+            answers (list): dict with score, start, end and answer (like `QuestionAnsweringPipeline`
+                returns) for every question
+        """
+        if not questions:
+            return []
+        with self._model_handle.lock:
+            with self.instrumentation.stage("qa.tokenize"):
+                rows, context_ids, offsets, window_size = self._encode_many(
+                    questions, context, max_length, doc_stride, max_question_length
+                )
+            if not context_ids:
+                return [{"score": 0.0, "start": 0, "end": 0, "answer": ""} for _ in questions]
+            self.instrumentation.count("qa_windows", len(rows))
+
+            order = sorted(range(len(rows)), key=lambda idx: len(rows[idx][3]["input_ids"]))
+            best_spans = [None] * len(questions)
+            for batch_start in range(0, len(order), batch_size):
+                batch_indexes = order[batch_start : batch_start + batch_size]
+                inputs = self.tokenizer.pad(
+                    [rows[idx][3] for idx in batch_indexes], padding="longest", return_tensors="pt"
+                ).to(self.model.device)
+                if self.instrumentation.enabled:
+                    self.instrumentation.count("qa_tokens", inputs["input_ids"].numel())
+                with self.instrumentation.stage("qa.forward"):
+                    outputs = self.model(**inputs)
+                for idx, start_logits, end_logits in zip(
+                    batch_indexes, outputs.start_logits, outputs.end_logits
+                ):
+                    question_idx, window_start, context_start, _ = rows[idx]
+                    context_end = context_start + min(window_size, len(context_ids) - window_start)
+                    score, start, end = self._best_span(
+                        start_logits[context_start:context_end],
+                        end_logits[context_start:context_end],
+                        max_answer_length,
+                    )
+                    if best_spans[question_idx] is None or score > best_spans[question_idx][0]:
+                        best_spans[question_idx] = (score, window_start + start, window_start + end)
+
+        answers = []
+        for score, start, end in best_spans:
+            char_start, char_end = offsets[start][0], offsets[end][1]
+            answers.append({
+                "score": score,
+                "start": char_start,
+                "end": char_end,
+                "answer": context[char_start:char_end],
+            })
+        return answers
+
+    def _encode_many(self, questions, context, max_length, doc_stride, max_question_length):
+        """
+        Returns rows (question index, window start, context start in row, features),
+        context token ids, offsets of context tokens and the number of context tokens per window
+        """
+        encoded_context = self.tokenizer(
+            context, add_special_tokens=False, return_offsets_mapping=True
+        )
+        context_ids = encoded_context["input_ids"]
+        offsets = encoded_context["offset_mapping"]
+        if not context_ids:
+            return [], context_ids, offsets, 0
+        questions_ids = [
+            ids[:max_question_length]
+            for ids in self.tokenizer(list(questions), add_special_tokens=False)["input_ids"]
+        ]
+        window_size = max_length - max(
+            len(self.tokenizer.build_inputs_with_special_tokens(ids, [])) for ids in questions_ids
+        )
+        assert window_size > doc_stride, "questions are too long for max_length and doc_stride"
+        window_starts = range(0, max(len(context_ids) - doc_stride, 1), window_size - doc_stride)
+
+        # (question index, window start, context start in row, features)
+        rows = []
+        for question_idx, question_ids in enumerate(questions_ids):
+            special_tokens_mask = self.tokenizer.get_special_tokens_mask(question_ids, context_ids[:1])
+            context_start = [
+                position for position, special in enumerate(special_tokens_mask) if not special
+            ][len(question_ids)]
+            for window_start in window_starts:
+                window_ids = context_ids[window_start : window_start + window_size]
+                features = {
+                    "input_ids": self.tokenizer.build_inputs_with_special_tokens(question_ids, window_ids)
+                }
+                if "token_type_ids" in self.tokenizer.model_input_names:
+                    features["token_type_ids"] = self.tokenizer.create_token_type_ids_from_sequences(
+                        question_ids, window_ids
+                    )
+                rows.append((question_idx, window_start, context_start, features))
+        return rows, context_ids, offsets, window_size
+
+    @staticmethod
+    def _best_span(start_logits, end_logits, max_answer_length):
+        """
+        Returns (score, start token, end token) of the most probable span of the window
+        """
+        scores = torch.outer(start_logits.float().softmax(-1), end_logits.float().softmax(-1))
+        # end must not precede start, and the span must not be longer than max_answer_length
+        scores = torch.tril(torch.triu(scores), max_answer_length - 1)
+        best = scores.argmax().item()
+        start, end = divmod(best, scores.shape[1])
+        return scores[start, end].item(), start, end
+
 
 if __name__ == '__main__':
     context = "Raja Purnawarman mulai memerintah Kerajaan Tarumanegara pada tahun 395 M."
@@ -30,3 +166,4 @@ if __name__ == '__main__':
 
     extractor = ExtractiveQAExtractor()
     print(extractor(question, context))
+    print(extractor.extract_many([question, "Kapan Raja Purnawarman mulai memerintah?"], context))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage instrumentation of extractors: timers, counters and optional peak memory
+
+Extractors time their stages (e.g. "ner.forward", "regex.scan") with `instrumentation.stage(name)`
+and count processed items (mentions, pairs, hypotheses, tokens, pages) with
+`instrumentation.count(name, value)`. By default extractors use `NULL_INSTRUMENTATION`, which does
+nothing, so instrumentation costs a method call per stage when it's disabled.
+"""
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+import warnings
+from collections import defaultdict
+from typing import Optional
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class _StageStats:
+    __slots__ = ("calls", "total_time", "max_time", "peak_memory")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.peak_memory = None
+
+
+class Instrumentation:
+    """
+    Collects timings and counters of stages, one object can be shared by many extractors
+    and threads
+
+    Usage:
+        instrumentation = Instrumentation()
+        extractor = MentionExtractor(instrumentation=instrumentation)
+        extractor(text)
+        print(instrumentation.to_json())
+    """
+    enabled = True
+
+    def __init__(self, track_memory: bool = False):
+        """
+        Args:
+            track_memory (bool): If True, peak memory of every stage is sampled with `tracemalloc`
+                (Python allocations only, e.g. torch tensors aren't counted, and concurrent stages
+                in different threads share the peak), it slows down allocations noticeably.
+                It requires `tracemalloc.reset_peak` (Python 3.9+), memory isn't tracked otherwise
+        """
+        if track_memory and not hasattr(tracemalloc, "reset_peak"):
+            warnings.warn("peak memory of stages isn't tracked, it requires Python 3.9+")
+            track_memory = False
+        self.track_memory = track_memory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stages = defaultdict(_StageStats)
+        self._counters = defaultdict(int)
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name: str):
+        """
+        Context manager timing the stage
+        """
+        return self._timed_stage(name)
+
+    @contextlib.contextmanager
+    def _timed_stage(self, name):
+        frame = self._enter_memory() if self.track_memory else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak_memory = self._exit_memory(frame) if frame is not None else None
+            self.record(name, elapsed, peak_memory)
+
+    def record(self, name: str, elapsed: float, peak_memory: Optional[int] = None):
+        """
+        Records a run of the stage timed by the caller, e.g. a run spread over iterations
+        of a generator
+        """
+        with self._lock:
+            stats = self._stages[name]
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            if peak_memory is not None:
+                stats.peak_memory = max(stats.peak_memory or 0, peak_memory)
+
+    def _enter_memory(self):
+        # peak of a stage includes peaks of nested stages, tracemalloc has only one peak,
+        # so peaks of nested stages are propagated to outer ones through the stack
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        frame = [current, current]
+        stack.append(frame)
+        return frame
+
+    def _exit_memory(self, frame):
+        stack = self._local.stack
+        peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+        stack.pop()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        return peak - frame[0]
+
+    def count(self, name: str, value: int = 1):
+        """
+        Adds value to the counter
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = {}
+            for name, stats in sorted(self._stages.items()):
+                stages[name] = {
+                    "calls": stats.calls,
+                    "total_time": stats.total_time,
+                    "mean_time": stats.total_time / stats.calls if stats.calls else 0.0,
+                    "max_time": stats.max_time,
+                }
+                if stats.peak_memory is not None:
+                    stages[name]["peak_memory"] = stats.peak_memory
+            return {"stages": stages, "counters": dict(sorted(self._counters.items()))}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "indonesian_ie") -> str:
+        """
+        Stats in Prometheus text exposition format
+        """
+        stats = self.to_dict()
+        metrics = [
+            ("stage_seconds_total", "counter", "Total time spent in the stage",
+             "stage", {name: stage["total_time"] for name, stage in stats["stages"].items()}),
+            ("stage_calls_total", "counter", "Number of runs of the stage",
+             "stage", {name: stage["calls"] for name, stage in stats["stages"].items()}),
+            ("stage_max_seconds", "gauge", "Longest run of the stage",
+             "stage", {name: stage["max_time"] for name, stage in stats["stages"].items()}),
+            ("stage_peak_memory_bytes", "gauge", "Peak memory allocated during the stage",
+             "stage", {name: stage["peak_memory"] for name, stage in stats["stages"].items()
+                       if "peak_memory" in stage}),
+            ("items_total", "counter", "Number of processed items",
+             "item", stats["counters"]),
+        ]
+        lines = []
+        for metric, metric_type, description, label, values in metrics:
+            if not values:
+                continue
+            lines.append(f"# HELP {prefix}_{metric} {description}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            for name, value in values.items():
+                lines.append(f'{prefix}_{metric}{{{label}="{_escape_label(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class NullInstrumentation(Instrumentation):
+    """
+    Disabled instrumentation, stages and counters are ignored
+    """
+    enabled = False
+
+    def __init__(self):
+        super().__init__(track_memory=False)
+
+    def stage(self, name: str):
+        return _NULL_CONTEXT
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def record(self, name: str, elapsed: float, peak_memory: Optional[int] = None):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+def get_instrumentation(instrumentation: Optional[Instrumentation]) -> Instrumentation:
+    return instrumentation if instrumentation is not None else NULL_INSTRUMENTATION
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Column-wise collection of mentions passed between stages of a pipeline
+
+At the API of extractors mentions are dicts ("entity_group", "score", "word", "start", "end", ...).
+`MentionCollection` keeps them as columns instead: offsets and scores in typed arrays (NumPy arrays
+if NumPy is installed, `array.array` otherwise), entity types as integer codes and words in a list,
+so shifting, filtering and pairing of mentions don't create, copy or compare dicts.
+Mentions are converted back to dicts with `to_dicts` (or indexing) at the API boundary.
+"""
+import math
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# entity type codes are shared by all collections, so collections can be concatenated
+# and compared without remapping codes
+_TYPE_CODES: Dict[str, int] = {}
+_TYPE_NAMES: List[str] = []
+_TYPE_CODES_LOCK = threading.Lock()
+
+_COLUMNS = ("entity_group", "score", "word", "start", "end")
+
+
+def get_type_code(entity_type: str) -> int:
+    """
+    Returns the integer code of entity type, a new code is assigned to an unknown type
+    """
+    code = _TYPE_CODES.get(entity_type)
+    if code is None:
+        with _TYPE_CODES_LOCK:
+            code = _TYPE_CODES.get(entity_type)
+            if code is None:
+                code = len(_TYPE_NAMES)
+                _TYPE_NAMES.append(entity_type)
+                _TYPE_CODES[entity_type] = code
+    return code
+
+
+def _int_array(values=()):
+    if np is not None:
+        return np.asarray(values, dtype=np.int64).reshape(-1)
+    return array("q", values)
+
+
+def _float_array(values=()):
+    if np is not None:
+        return np.asarray(values, dtype=np.float64).reshape(-1)
+    return array("d", values)
+
+
+def _take(values, indexes):
+    if np is not None:
+        return values[np.asarray(indexes, dtype=np.int64)]
+    return array(values.typecode, [values[idx] for idx in indexes])
+
+
+def _concat(arrays, make_array):
+    if np is not None:
+        return np.concatenate(arrays) if arrays else make_array()
+    result = make_array()
+    for values in arrays:
+        result.extend(values)
+    return result
+
+
+def _to_dict(word, type_code, start, end, score, extra):
+    mention = {"entity_group": _TYPE_NAMES[type_code]}
+    if score == score:  # not NaN
+        mention["score"] = score
+    mention["word"] = word
+    mention["start"] = start
+    mention["end"] = end
+    if extra:
+        mention.update(extra)
+    return mention
+
+
+class MentionCollection:
+    """
+    Mentions stored column-wise, the i-th mention is (words[i], type_codes[i], starts[i], ends[i],
+    scores[i]), a missing score is NaN, keys other than `_COLUMNS` (e.g. "canonical") are kept
+    in `extras` (None if no mention has them)
+
+    Usage:
+        mentions = MentionCollection.from_dicts(extractor(text))
+        owned = mentions.shift(offset).starting_in(start, end).sorted()
+        owned.to_dicts()
+    """
+    __slots__ = ("words", "type_codes", "starts", "ends", "scores", "extras")
+
+    def __init__(
+        self,
+        words: Sequence[str] = (),
+        type_codes: Sequence[int] = (),
+        starts: Sequence[int] = (),
+        ends: Sequence[int] = (),
+        scores: Sequence[float] = (),
+        extras: Optional[List[Optional[dict]]] = None,
+    ):
+        self.words = list(words)
+        self.type_codes = _int_array(type_codes)
+        self.starts = _int_array(starts)
+        self.ends = _int_array(ends)
+        self.scores = _float_array(scores)
+        self.extras = extras
+        assert len(self.type_codes) == len(self.starts) == len(self.ends) == len(self.scores) \
+            == len(self.words)
+
+    @classmethod
+    def from_dicts(cls, mentions: Iterable[dict]) -> "MentionCollection":
+        """
+        Builds the collection from mention dicts, a collection is returned as is
+        """
+        if isinstance(mentions, MentionCollection):
+            return mentions
+        words, type_codes, starts, ends, scores, extras = [], [], [], [], [], []
+        has_extras = False
+        for mention in mentions:
+            words.append(mention["word"])
+            type_codes.append(get_type_code(mention["entity_group"]))
+            starts.append(mention["start"])
+            ends.append(mention["end"])
+            scores.append(mention.get("score", math.nan))
+            extra = None
+            if len(mention) > 4 + ("score" in mention):
+                extra = {key: value for key, value in mention.items() if key not in _COLUMNS}
+                has_extras = True
+            extras.append(extra)
+        return cls(words, type_codes, starts, ends, scores, extras if has_extras else None)
+
+    @classmethod
+    def concat(cls, collections: Sequence["MentionCollection"]) -> "MentionCollection":
+        """
+        Concatenates collections, indexes of the i-th collection are shifted
+        by the total length of the previous ones
+        """
+        collections = [collection for collection in collections if len(collection)]
+        if len(collections) == 1:
+            return collections[0]
+        result = cls.__new__(cls)
+        result.words = [word for collection in collections for word in collection.words]
+        result.type_codes = _concat([c.type_codes for c in collections], _int_array)
+        result.starts = _concat([c.starts for c in collections], _int_array)
+        result.ends = _concat([c.ends for c in collections], _int_array)
+        result.scores = _concat([c.scores for c in collections], _float_array)
+        result.extras = None
+        if any(collection.extras is not None for collection in collections):
+            result.extras = [
+                extra
+                for collection in collections
+                for extra in (collection.extras or [None] * len(collection))
+            ]
+        return result
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, idx: int) -> dict:
+        return _to_dict(
+            self.words[idx], int(self.type_codes[idx]), int(self.starts[idx]), int(self.ends[idx]),
+            float(self.scores[idx]), None if self.extras is None else self.extras[idx],
+        )
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.to_dicts())
+
+    def to_dicts(self) -> List[dict]:
+        # columns are converted to Python lists at once, it's faster than per element
+        return list(map(
+            _to_dict,
+            self.words,
+            self.type_codes.tolist(),
+            self.starts.tolist(),
+            self.ends.tolist(),
+            self.scores.tolist(),
+            self.extras or [None] * len(self),
+        ))
+
+    def entity_type(self, idx: int) -> str:
+        return _TYPE_NAMES[self.type_codes[idx]]
+
+    def take(self, indexes: Sequence[int]) -> "MentionCollection":
+        """
+        Returns the collection of mentions at indexes (in the order of indexes)
+        """
+        indexes = indexes.tolist() if hasattr(indexes, "tolist") else list(indexes)
+        result = MentionCollection.__new__(MentionCollection)
+        result.words = [self.words[idx] for idx in indexes]
+        result.type_codes = _take(self.type_codes, indexes)
+        result.starts = _take(self.starts, indexes)
+        result.ends = _take(self.ends, indexes)
+        result.scores = _take(self.scores, indexes)
+        result.extras = None if self.extras is None else [self.extras[idx] for idx in indexes]
+        return result
+
+    def shift(self, offset: int) -> "MentionCollection":
+        """
+        Returns the collection with start and end offsets moved by offset
+        """
+        result = self.take(range(len(self)))
+        if np is not None:
+            result.starts += offset
+            result.ends += offset
+        else:
+            result.starts = array("q", [start + offset for start in result.starts])
+            result.ends = array("q", [end + offset for end in result.ends])
+        return result
+
+    def starting_in(self, lo: int, hi: int) -> "MentionCollection":
+        """
+        Returns the collection of mentions starting in [lo, hi)
+        """
+        if np is not None:
+            return self.take(np.flatnonzero((self.starts >= lo) & (self.starts < hi)))
+        return self.take([idx for idx, start in enumerate(self.starts) if lo <= start < hi])
+
+    def ending_from(self, pos: int) -> "MentionCollection":
+        """
+        Returns the collection of mentions ending at or after pos
+        """
+        if np is not None:
+            return self.take(np.flatnonzero(self.ends >= pos))
+        return self.take([idx for idx, end in enumerate(self.ends) if end >= pos])
+
+    def order_by_start(self) -> List[int]:
+        """
+        Indexes of mentions sorted by start, mentions with the same start keep their order
+        """
+        if np is not None:
+            return np.argsort(self.starts, kind="stable").tolist()
+        return sorted(range(len(self)), key=self.starts.__getitem__)
+
+    def sorted(self) -> "MentionCollection":
+        return self.take(self.order_by_start())
+
+    def span(self):
+        """
+        Returns (minimal start, maximal end) of the mentions, the collection must not be empty
+        """
+        return int(min(self.starts)), int(max(self.ends))
+
+    def buckets(self) -> Dict[str, List[int]]:
+        """
+        Indexes of mentions of every entity type sorted by start
+        """
+        type_codes = self.type_codes.tolist()
+        buckets = {}
+        for idx in self.order_by_start():
+            buckets.setdefault(_TYPE_NAMES[type_codes[idx]], []).append(idx)
+        return buckets
+
+    def word_codes(self):
+        """
+        Integer codes of words, mentions with the same word (ignoring surrounding
+        whitespaces) have the same code
+        """
+        codes = {}
+        return _int_array([codes.setdefault(word.strip(), len(codes)) for word in self.words])
+
+
+# maximal number of candidate pairs materialized at once by `iter_pair_indexes`
+_PAIRS_CHUNK_SIZE = 1 << 16
+
+
+def iter_pair_indexes(
+    mentions: MentionCollection,
+    pair_types: Iterable,
+    max_distance: Optional[int] = None,
+    sentence_starts: Optional[Sequence[int]] = None,
+    max_sentence_distance: Optional[int] = None,
+    new_from: int = 0,
+) -> Iterator[tuple]:
+    """
+    Generates (subject index, object index) pairs of mentions of (subject type, object type)
+    from pair_types, mentions with the same word aren't paired. Mentions are bucketed by type
+    and sorted by start, so pairs further than max_distance characters or max_sentence_distance
+    sentences apart are skipped with binary search.
+    Args:
+        mentions (MentionCollection): Mentions
+        pair_types (list): List of (subject type, object type)
+        max_distance (int): If set, maximal distance in characters between paired mentions
+        sentence_starts (list): Sorted offsets of sentences, the first one is 0,
+            required for max_sentence_distance
+        max_sentence_distance (int): If set, maximal distance in sentences between paired mentions
+        new_from (int): Only pairs with at least one mention at index >= new_from are generated
+    Returns:
+        iterator of (subject index, object index), subjects and objects in the order of starts
+        for every pair type
+    """
+    if sentence_starts is None:
+        max_sentence_distance = None
+    buckets = mentions.buckets()
+    word_codes = mentions.word_codes()
+    if np is None:
+        pairs_fn = _iter_bucket_pairs
+    else:
+        pairs_fn = _iter_bucket_pairs_vectorized
+        buckets = {entity_type: np.asarray(bucket) for entity_type, bucket in buckets.items()}
+        if max_sentence_distance is not None:
+            sentence_starts = np.asarray(sentence_starts, dtype=np.int64)
+    for subject_type, object_type in pair_types:
+        subjects = buckets.get(subject_type)
+        objects = buckets.get(object_type)
+        if subjects is None or objects is None:
+            continue
+        yield from pairs_fn(
+            mentions, word_codes, subjects, objects,
+            max_distance, sentence_starts, max_sentence_distance, new_from,
+        )
+
+
+def _iter_bucket_pairs(
+    mentions, word_codes, subjects, objects,
+    max_distance, sentence_starts, max_sentence_distance, new_from,
+):
+    starts, ends = mentions.starts, mentions.ends
+    object_starts = [starts[idx] for idx in objects]
+    max_object_length = max(ends[idx] - starts[idx] for idx in objects)
+    for subject in subjects:
+        subject_start, subject_end = starts[subject], ends[subject]
+        lo, hi = 0, len(objects)
+        if max_distance is not None:
+            lo = bisect_left(object_starts, subject_start - max_distance - max_object_length)
+            hi = bisect_right(object_starts, subject_end + max_distance)
+        if max_sentence_distance is not None:
+            sentence_idx = bisect_right(sentence_starts, subject_start) - 1
+            first_idx = max(sentence_idx - max_sentence_distance, 0)
+            last_idx = sentence_idx + max_sentence_distance + 1
+            lo = max(lo, bisect_left(object_starts, sentence_starts[first_idx]))
+            if last_idx < len(sentence_starts):
+                hi = min(hi, bisect_left(object_starts, sentence_starts[last_idx]))
+        for object in objects[lo:hi]:
+            if subject == object or word_codes[subject] == word_codes[object]:
+                continue
+            if subject < new_from and object < new_from:
+                continue
+            if max_distance is not None and (
+                max(subject_start, starts[object]) - min(subject_end, ends[object]) > max_distance
+            ):
+                continue
+            yield subject, object
+
+
+def _iter_bucket_pairs_vectorized(
+    mentions, word_codes, subjects, objects,
+    max_distance, sentence_starts, max_sentence_distance, new_from,
+):
+    # the same as `_iter_bucket_pairs`: ranges [lo, hi) of objects are found for all subjects
+    # at once, and candidate pairs of a chunk of subjects are filtered with array operations
+    starts, ends = mentions.starts, mentions.ends
+    object_starts = starts[objects]
+    subject_starts, subject_ends = starts[subjects], ends[subjects]
+    lo = np.zeros(len(subjects), dtype=np.int64)
+    hi = np.full(len(subjects), len(objects), dtype=np.int64)
+    if max_distance is not None:
+        max_object_length = (ends[objects] - object_starts).max()
+        lo = np.searchsorted(
+            object_starts, subject_starts - max_distance - max_object_length, "left"
+        )
+        hi = np.searchsorted(object_starts, subject_ends + max_distance, "right")
+    if max_sentence_distance is not None:
+        sentence_idx = np.searchsorted(sentence_starts, subject_starts, "right") - 1
+        first_idx = np.maximum(sentence_idx - max_sentence_distance, 0)
+        last_idx = sentence_idx + max_sentence_distance + 1
+        lo = np.maximum(lo, np.searchsorted(object_starts, sentence_starts[first_idx], "left"))
+        last_hi = np.searchsorted(
+            object_starts, sentence_starts[np.minimum(last_idx, len(sentence_starts) - 1)], "left"
+        )
+        hi = np.where(last_idx < len(sentence_starts), np.minimum(hi, last_hi), hi)
+    counts = np.maximum(hi - lo, 0)
+    cumulative_counts = np.cumsum(counts)
+
+    chunk_start = 0
+    while chunk_start < len(subjects):
+        # subjects [chunk_start, chunk_end) have about _PAIRS_CHUNK_SIZE candidates
+        done = cumulative_counts[chunk_start] - counts[chunk_start]
+        chunk_end = max(
+            int(np.searchsorted(cumulative_counts, done + _PAIRS_CHUNK_SIZE, "right")),
+            chunk_start + 1,
+        )
+        chunk_counts = counts[chunk_start:chunk_end]
+        num_candidates = int(chunk_counts.sum())
+        if num_candidates:
+            subject_idx = np.repeat(subjects[chunk_start:chunk_end], chunk_counts)
+            # position of the candidate among objects: lo of its subject + rank within the subject
+            first_candidates = np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            positions = (
+                np.arange(num_candidates) - first_candidates
+                + np.repeat(lo[chunk_start:chunk_end], chunk_counts)
+            )
+            object_idx = objects[positions]
+            keep = (subject_idx != object_idx) & (word_codes[subject_idx] != word_codes[object_idx])
+            if new_from:
+                keep &= np.maximum(subject_idx, object_idx) >= new_from
+            if max_distance is not None:
+                distances = (
+                    np.maximum(starts[subject_idx], starts[object_idx])
+                    - np.minimum(ends[subject_idx], ends[object_idx])
+                )
+                keep &= distances <= max_distance
+            yield from zip(subject_idx[keep].tolist(), object_idx[keep].tolist())
+        chunk_start = chunk_end
@@ -1,26 +1,61 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from transformers import AutoModelForTokenClassification, AutoTokenizer, NerPipeline
+import re
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+from transformers import AutoModelForTokenClassification, NerPipeline
 
 from indonesian_ie.base_extractor import BaseExtractor
+from indonesian_ie.model_registry import get_model_registry
 from indonesian_ie.regexp_extractor import RegexpRulesEntityExtractor
+from indonesian_ie.span_index import filter_contained_spans
 
 
 class MentionExtractor(BaseExtractor):
+    cache_fields = (
+        "model_name", "aggregation_strategy", "window_size", "window_overlap", "quantization"
+    )
 
     def __init__(
         self,
         model_name: str = "bstds/id-roberta-ner",
         aggregation_strategy: str = "max",
+        window_size: Optional[int] = None,
+        window_overlap: int = 200,
+        batch_size: int = 8,
+        quantization: Optional[str] = None,
         **kwargs
     ):
+        """
+        Args:
+            model_name (str): NER model name
+            aggregation_strategy (str): Aggregation strategy of `NerPipeline`
+            window_size (int): If set, texts longer than this number of characters are split
+                on line/sentence boundaries into overlapping windows which are run as a batch
+            window_overlap (int): Number of characters shared by consecutive windows
+            batch_size (int): Number of windows per forward pass
+            quantization (str): "int8" to run dynamically int8-quantized model on CPU
+                (see `indonesian_ie.quantization`)
+        """
         super().__init__(**kwargs)
-        model = AutoModelForTokenClassification.from_pretrained(model_name)
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model_name = model_name
+        self.aggregation_strategy = aggregation_strategy
+        self.quantization = quantization
+        assert window_size is None or window_overlap < window_size
+        self.window_size = window_size
+        self.window_overlap = window_overlap
+        self.batch_size = batch_size
+        # weights are shared with other extractors using the same model
+        self._model_handle = get_model_registry().acquire(
+            AutoModelForTokenClassification, model_name, quantization=quantization
+        )
         self.pipeline = NerPipeline(
-            model=model, tokenizer=tokenizer, aggregation_strategy=aggregation_strategy
+            model=self._model_handle.model,
+            tokenizer=self._model_handle.tokenizer,
+            aggregation_strategy=aggregation_strategy,
         )
-        self.rule_based_extractor = RegexpRulesEntityExtractor()
+        self.rule_based_extractor = RegexpRulesEntityExtractor(instrumentation=self.instrumentation)
 
     def _extract(self, *args, **kwargs):
         """
@@ -45,7 +80,29 @@ class MentionExtractor(BaseExtractor):
         'LAN': Language
         """
         text = args[0]
-        mentions = self.pipeline(*args, **kwargs)
+        if self.window_size and len(text) > self.window_size:
+            mentions = self._extract_windowed([text], **kwargs)[0]
+        else:
+            with self._model_handle.lock, self.instrumentation.stage("ner.forward"):
+                mentions = self.pipeline(*args, **kwargs)
+        return self._postprocess(text, mentions, *args, **kwargs)
+
+    def extract_many(self, texts, **kwargs):
+        """
+        Extracts mentions from many texts at once: (windows of) all texts are run
+        through NER model in batches of `batch_size`, results are not cached
+        Args:
+            texts (list): List of texts
+        Returns:
+            mentions (list): Mentions of every text
+        """
+        texts = list(texts)
+        return [
+            self._postprocess(text, mentions, text, **kwargs)
+            for text, mentions in zip(texts, self._extract_windowed(texts, **kwargs))
+        ]
+
+    def _postprocess(self, text, mentions, *args, **kwargs):
         tags_mapping = {
             "DAT": "DATE",
             "GPE": "LOC",
@@ -60,18 +117,82 @@ class MentionExtractor(BaseExtractor):
             )
 
         rule_based_mentions = self.rule_based_extractor(*args, **kwargs)
+        # rule based mentions don't overlap each other, so it's enough to check
+        # containment in NER mentions
+        with self.instrumentation.stage("ner.merge"):
+            mentions.extend(filter_contained_spans(rule_based_mentions, mentions))
+        self.instrumentation.count("mentions", len(mentions))
+        return mentions
 
-        for rule_based_mention in rule_based_mentions:
-            for mention in mentions:
-                if (
-                    rule_based_mention["start"] >= mention["start"]
-                    and rule_based_mention["end"] <= mention["end"]
-                ):
-                    break
+    def _windows(self, text):
+        """
+        Splits text into windows of at most `window_size` characters ending on line/sentence
+        boundaries (if there are any in the second half of the window and after the overlap),
+        consecutive windows share about `window_overlap` characters, every window starts
+        at least `window_size - window_overlap` characters after the previous one
+        unless the previous window ends earlier on a boundary
+        Returns:
+            windows (list): List of (start, end) offsets
+        """
+        boundaries = [match.end() for match in re.finditer(r"\n|[.!?;]\s", text)]
+        # a window ending too close to its start would make the next windows crawl forward
+        min_length = max(self.window_size // 2, self.window_overlap + 1)
+        step = self.window_size - self.window_overlap
+        windows = []
+        start = 0
+        while True:
+            if len(text) - start <= self.window_size:
+                windows.append((start, len(text)))
+                return windows
+            limit = start + self.window_size
+            pos = bisect_right(boundaries, limit)
+            end = boundaries[pos - 1] if pos and boundaries[pos - 1] - start >= min_length else limit
+            windows.append((start, end))
+            overlap_start = end - self.window_overlap
+            pos = bisect_left(boundaries, overlap_start)
+            if pos < len(boundaries) and boundaries[pos] < end:
+                overlap_start = boundaries[pos]
+            start = max(overlap_start, min(start + step, end))
+
+    def _extract_windowed(self, texts, **kwargs):
+        """
+        Runs NER over overlapping windows of texts as a batch, maps offsets back to the text
+        and keeps a mention only from the window which owns its start: the overlap of two
+        windows is owned half by one and half by another, so mentions aren't duplicated
+        Returns:
+            mentions (list): Mentions of every text
+        """
+        # (text index, window start, start of owned part, end of owned part)
+        windows = []
+        for text_idx, text in enumerate(texts):
+            if self.window_size and len(text) > self.window_size:
+                text_windows = self._windows(text)
             else:
-                mentions.append(rule_based_mention)
-        return mentions
+                text_windows = [(0, len(text))]
+            bounds = [0]
+            for (_, prev_end), (start, _) in zip(text_windows, text_windows[1:]):
+                bounds.append((start + prev_end) // 2)
+            bounds.append(len(text))
+            for (start, end), own_start, own_end in zip(text_windows, bounds, bounds[1:]):
+                windows.append((text_idx, start, end, own_start, own_end))
 
+        self.instrumentation.count("windows", len(windows))
+        with self._model_handle.lock, self.instrumentation.stage("ner.forward"):
+            outputs = self.pipeline(
+                (texts[text_idx][start:end] for text_idx, start, end, _, _ in windows),
+                batch_size=self.batch_size,
+                **kwargs
+            )
+            mentions = [[] for _ in texts]
+            # outputs are computed lazily, while iterating over them
+            for window, window_mentions in zip(windows, outputs):
+                text_idx, start, _, own_start, own_end = window
+                for mention in window_mentions:
+                    mention["start"] += start
+                    mention["end"] += start
+                    if own_start <= mention["start"] < own_end:
+                        mentions[text_idx].append(mention)
+        return mentions
 
 if __name__ == '__main__':
     text = """
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import copy
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+def _iter_tensors(value):
+    # int8 weights of dynamically quantized Linear layers are in `_packed_params` entries
+    # of the state dict, they are tuples of (weight, bias) rather than tensors
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _iter_tensors(item)
+    elif hasattr(value, "numel") and hasattr(value, "element_size"):
+        yield value
+
+
+def _model_size(model) -> int:
+    """
+    Size of tensors of the state dict of torch model in bytes (quantized weights included),
+    tensors shared by several entries (e.g. tied weights) are counted once
+    """
+    seen = set()
+    size = 0
+    for value in model.state_dict(keep_vars=True).values():
+        for tensor in _iter_tensors(value):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                size += tensor.numel() * tensor.element_size()
+    return size
+
+
+class _RegistryEntry:
+
+    def __init__(self, key, model, tokenizer):
+        self.key = key
+        self.model = model
+        self.tokenizer = tokenizer
+        self.size = _model_size(model)
+        self.refcount = 0
+
+
+class ModelHandle:
+    """
+    Lease of a shared model, the model is released when the handle
+    is released or garbage collected (e.g. together with the extractor holding it)
+
+    Weights of the model are shared by all handles, the tokenizer is a copy owned by the handle:
+    fast tokenizers raise "Already borrowed" when they are called concurrently with different
+    truncation/padding settings, so extractors sharing a model don't share a tokenizer.
+    Extractors hold `lock` while they use the tokenizer and run the model,
+    so one extractor can be called from several threads.
+    """
+
+    def __init__(self, registry, entry):
+        self._registry = registry
+        self._entry = entry
+        self._released = False
+        self.tokenizer = copy.deepcopy(entry.tokenizer)
+        self.lock = threading.RLock()
+
+    @property
+    def model(self):
+        return self._entry.model
+
+    @property
+    def key(self):
+        return self._entry.key
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._registry._release(self._entry)
+
+    def __del__(self):
+        self.release()
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of models and tokenizers keyed by
+    (model class, model name, device, dtype, quantization, `from_pretrained` kwargs)
+
+    Extractors loading the same model share one copy of its weights. Every `acquire` increments
+    the reference count of the model, releasing the handle decrements it. Models which aren't used
+    by anyone (idle) stay loaded until the total size of loaded models exceeds `memory_budget`,
+    then idle models are evicted in least recently used order. Models in use are never evicted,
+    so the budget can be exceeded if all models are in use.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None):
+        """
+        Args:
+            memory_budget (int): Maximal total size of loaded models in bytes, unlimited if None
+        """
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def acquire(
+        self,
+        model_cls,
+        model_name: str,
+        device: str = "cpu",
+        dtype=None,
+        quantization: Optional[str] = None,
+        **kwargs
+    ) -> ModelHandle:
+        """
+        Returns handle of the shared model and tokenizer, loads them with `from_pretrained` if needed,
+        the global lock isn't held while a model is loaded, so loading of one model doesn't block
+        `acquire`/`release` of other models
+        Args:
+            model_cls: Model class, e.g. `AutoModelForTokenClassification`
+            model_name (str): Model name or path
+            device (str): Device of the model
+            dtype: torch dtype of the model, the default one if None
+            quantization (str): "int8" for dynamically int8-quantized model
+                (see `indonesian_ie.quantization`, CPU only), eager model if None
+            kwargs: Keyword arguments of `model_cls.from_pretrained` (e.g. revision, num_labels),
+                they are a part of the key
+        Returns:
+            handle (ModelHandle): Handle with `model` and `tokenizer`
+        """
+        assert quantization in [None, "int8"]
+        assert quantization is None or str(device) == "cpu", "quantized models run on CPU only"
+        key = (
+            f"{model_cls.__module__}.{model_cls.__qualname__}",
+            model_name,
+            str(device),
+            str(dtype),
+            quantization,
+            tuple(sorted((name, repr(value)) for name, value in kwargs.items())),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return ModelHandle(self, self._lease(entry, loaded=False))
+            # concurrent acquires of the same model wait for one load
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return ModelHandle(self, self._lease(entry, loaded=False))
+            try:
+                entry = self._load(key, model_cls, model_name, device, dtype, quantization, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+                raise
+            with self._lock:
+                self._entries[key] = entry
+                self._load_locks.pop(key, None)
+                self._lease(entry, loaded=True)
+        return ModelHandle(self, entry)
+
+    def _lease(self, entry, loaded):
+        # called with the lock held
+        if loaded:
+            self.loads += 1
+        else:
+            self.hits += 1
+        self._entries.move_to_end(entry.key)
+        entry.refcount += 1
+        self._evict()
+        return entry
+
+    def _load(self, key, model_cls, model_name, device, dtype, quantization, **kwargs):
+        from transformers import AutoTokenizer
+
+        if dtype is not None:
+            kwargs["torch_dtype"] = dtype
+        if quantization == "int8":
+            from indonesian_ie.quantization import load_quantized
+
+            model = load_quantized(model_cls, model_name, **kwargs)
+        else:
+            model = model_cls.from_pretrained(model_name, **kwargs)
+            model.to(device)
+        model.eval()
+        with self._lock:
+            tokenizer = self._find_tokenizer(model_name)
+        if tokenizer is None:
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+        return _RegistryEntry(key, model, tokenizer)
+
+    def _find_tokenizer(self, model_name):
+        # tokenizer doesn't depend on model class/device/dtype
+        for entry in self._entries.values():
+            if entry.key[1] == model_name:
+                return entry.tokenizer
+        return None
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refcount -= 1
+            self._evict()
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def _evict(self):
+        if self.memory_budget is None:
+            return
+        size = self.size
+        for key in list(self._entries):
+            if size <= self.memory_budget:
+                break
+            entry = self._entries[key]
+            if entry.refcount <= 0:
+                del self._entries[key]
+                size -= entry.size
+                self.evictions += 1
+
+    def clear_idle(self):
+        """
+        Evicts all idle models
+        """
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.refcount <= 0]:
+                del self._entries[key]
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "size": self.size,
+                "memory_budget": self.memory_budget,
+                "models": [
+                    {"key": key, "size": entry.size, "refcount": entry.refcount}
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _registry
@@ -1,23 +1,38 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import threading
+from typing import Iterable, Iterator, Optional
+
+# language -> spacy pipeline, shared by all tokenizers of the process
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_model(lang: str = "id"):
+    """
+    Loads spacy pipeline with UDPipe model for the language once per process,
+    the model is downloaded only if it isn't on disk yet
+    """
+    with _models_lock:
+        if lang not in _models:
+            try:
+                import spacy_udpipe
+            except ImportError:
+                print("Please run `pip install spacy-udpipe` first")
+                raise
+            # returns early if the model is already downloaded
+            spacy_udpipe.download(lang)
+            _models[lang] = spacy_udpipe.load(lang)
+        return _models[lang]
 
 
 class MorphSentenceTokenizer:
 
     def __init__(self, lang="id", *args, **kwargs):
-        try:
-            import spacy_udpipe
-            from spacy_udpipe import UDPipeModel
-        except:
-            print("Please run `pip install spacy-udpipe` first")
-
-        try:
-            spacy_udpipe.download(lang)
-            self.nlp = spacy_udpipe.load(lang)
-            self.udpipe_model = UDPipeModel(lang)
-            self.mode = kwargs.get("mode", "sentence")
-        except:
-            print("Please run `pip install spacy-udpipe` first")
+        self.nlp = load_model(lang)
+        # UDPipe model of the spacy tokenizer, so it isn't loaded twice
+        self.udpipe_model = self.nlp.tokenizer.model
+        self.mode = kwargs.get("mode", "sentence")
 
     def __call__(self, *args, **kwargs):
         return self._tokenize(*args, **kwargs)
@@ -40,6 +55,33 @@ class MorphSentenceTokenizer:
         else:
             return self._token_tokenize(text, *args, **kwargs)
 
+    def pipe(
+        self,
+        texts: Iterable[str],
+        batch_size: int = 64,
+        n_process: int = 1,
+        mode: Optional[str] = None,
+    ) -> Iterator[list]:
+        """
+        Tokenizes many texts, tokens are streamed through `nlp.pipe`, sentences come from
+        the UDPipe model like in `__call__`
+        Args:
+            texts (list): Texts, can be a generator
+            batch_size (int): Number of texts per batch of `nlp.pipe`, token mode only
+            n_process (int): Number of worker processes of `nlp.pipe`, token mode only
+            mode (str): "sentence" or "token", the mode of the tokenizer by default
+        Returns:
+            iterator of sentences (list of str) or tokens (list of spacy tokens) of every text
+        """
+        mode = mode or self.mode
+        if mode == "sentence":
+            for text in texts:
+                yield self._sentence_tokenize(text)
+            return
+        for doc in self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+            yield list(doc)
+
+
 if __name__ == '__main__':
     sentence_tokenizer = MorphSentenceTokenizer(mode="token")
     for token in sentence_tokenizer("Saya ingin makan nasi. Saya ingin minum air."):
@@ -48,3 +90,6 @@ if __name__ == '__main__':
     sentence_tokenizer = MorphSentenceTokenizer(mode="sentence")
     for sentence in sentence_tokenizer("Saya ingin makan nasi. Saya ingin minum air."):
         print(sentence)
+
+    for sentences in sentence_tokenizer.pipe(["Saya ingin makan nasi. Saya ingin minum air."] * 3):
+        print(sentences)
@@ -1,25 +1,56 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Callable, Optional, Sequence, Union
+import heapq
+from typing import Callable, List, Optional, Sequence, Union
 
 import torch
 
 import numpy as np
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from transformers import AutoModelForSequenceClassification
+
+from indonesian_ie.instrumentation import NULL_INSTRUMENTATION, get_instrumentation
+from indonesian_ie.model_registry import get_model_registry
 
 
 class CrossEncoderEntailmentReranker:
+    instrumentation = NULL_INSTRUMENTATION
 
     def __init__(
         self,
         model_name_or_path: str = 'w11wo/indonesian-roberta-base-indonli',
         device: str = 'cpu',
         attribute_getter: Callable = lambda x: x,
+        quantization: Optional[str] = None,
+        max_batch_size: int = 32,
+        max_tokens: Optional[int] = None,
+        instrumentation=None,
     ):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name_or_path)
-        self.cross_encoder = AutoModelForSequenceClassification.from_pretrained(
-            model_name_or_path
+        """
+        Args:
+            model_name_or_path (str): NLI model name or path
+            device (str): Device of the model
+            attribute_getter (callable): Returns text of a hypothesis
+            quantization (str): "int8" to run dynamically int8-quantized model on CPU
+                (see `indonesian_ie.quantization`)
+            max_batch_size (int): Maximal number of premise/hypothesis rows per forward pass
+            max_tokens (int): Maximal number of tokens (rows x padded length) per forward pass
+            instrumentation (Instrumentation): If set, timings of tokenization and forward passes
+                are collected into it
+        """
+        self.instrumentation = get_instrumentation(instrumentation)
+        self.model_name_or_path = model_name_or_path
+        self.quantization = quantization
+        self.max_batch_size = max_batch_size
+        self.max_tokens = max_tokens
+        # weights are shared with other rerankers using the same model
+        self._model_handle = get_model_registry().acquire(
+            AutoModelForSequenceClassification,
+            model_name_or_path,
+            device=device,
+            quantization=quantization,
         )
+        self.tokenizer = self._model_handle.tokenizer
+        self.cross_encoder = self._model_handle.model
         self.label2id = self.cross_encoder.config.label2id
         self.id2label = self.cross_encoder.config.id2label
         self.entailment_weights = {
@@ -40,30 +71,209 @@ class CrossEncoderEntailmentReranker:
         hypothesises: Sequence[str],
         threshold: float = 0.6,
         top_k: int = 1,
+        max_batch_size: Optional[int] = None,
+        max_tokens: Optional[int] = None,
         **kwargs
     ) -> Sequence:
-        if not hypothesises:
+        """
+        Returns top_k (hypothesis, score) with score >= threshold, sorted by score,
+        hypotheses are scored in length-sorted buckets (see `_iter_buckets`) and only top_k best
+        of them are kept in a heap, so memory doesn't grow with the number of hypotheses
+        """
+        if not hypothesises or top_k <= 0:
             return []
-        cross_data = [
-            (premise, self.attribute_getter(hypothesis)) for hypothesis in hypothesises
+        heap = []
+        for idx, score in self._iter_scores(premise, hypothesises, max_batch_size, max_tokens):
+            self._push_top_k(heap, idx, score, threshold, top_k)
+        return self._pop_top_k(heap, hypothesises)
+
+    @torch.inference_mode()
+    def rerank_many(
+        self,
+        queries: Sequence,
+        threshold: float = 0.6,
+        top_k: int = 1,
+        max_batch_size: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[List]:
+        """
+        Reranks hypotheses of many queries at once, premise/hypothesis rows of all queries
+        are packed into shared length-sorted batches, so many short documents don't mean
+        many small forward passes
+        Args:
+            queries (list): List of (premise, hypothesises)
+            threshold (float): Minimal score of a hypothesis
+            top_k (int): Maximal number of hypotheses per query
+            max_batch_size (int): Maximal number of rows per forward pass, `max_batch_size` by default
+            max_tokens (int): Maximal number of (padded) tokens per forward pass,
+                `max_tokens` by default
+        Returns:
+            results (list): top_k (hypothesis, score) sorted by score for every query
+        """
+        rows, owners = self._encode_queries(queries)
+        heaps = [[] for _ in queries]
+        for row_idx, score in self._score_rows(rows, max_batch_size, max_tokens):
+            query_idx, idx = owners[row_idx]
+            self._push_top_k(heaps[query_idx], idx, score, threshold, top_k)
+        return [
+            self._pop_top_k(heap, hypothesises) for heap, (_, hypothesises) in zip(heaps, queries)
         ]
-        encoded_input = self.tokenizer(
-            cross_data,
-            padding=True,
-            truncation=True,
-            return_tensors='pt',
+
+    @staticmethod
+    def _push_top_k(heap, idx, score, threshold, top_k):
+        if score < threshold or top_k <= 0:
+            return
+        # for the same score, hypothesis which comes first wins
+        item = (score, -idx)
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    @staticmethod
+    def _pop_top_k(heap, hypothesises):
+        return [(hypothesises[-neg_idx], score) for score, neg_idx in sorted(heap, reverse=True)]
+
+    @torch.inference_mode()
+    def score(
+        self,
+        premise: str,
+        hypothesises: Sequence,
+        batch_size: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[float]:
+        """
+        Scores every hypothesis against the premise in length-sorted batches,
+        the premise is tokenized only once and reused for all rows
+        Args:
+            premise (str): Premise, e.g. the whole document
+            hypothesises (list): List of hypotheses
+            batch_size (int): Maximal number of premise/hypothesis rows per forward pass,
+                `max_batch_size` by default
+            max_tokens (int): Maximal number of (padded) tokens per forward pass,
+                `max_tokens` by default
+        Returns:
+            scores (list): Entailment scores in the order of hypothesises
+        """
+        scores = [0.0] * len(hypothesises)
+        for idx, score in self._iter_scores(premise, hypothesises, batch_size, max_tokens):
+            scores[idx] = score
+        return scores
+
+    @torch.inference_mode()
+    def score_many(
+        self,
+        queries: Sequence,
+        batch_size: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[List[float]]:
+        """
+        Scores hypotheses of many queries at once in shared length-sorted batches
+        Args:
+            queries (list): List of (premise, hypothesises)
+            batch_size (int): Maximal number of rows per forward pass, `max_batch_size` by default
+            max_tokens (int): Maximal number of (padded) tokens per forward pass,
+                `max_tokens` by default
+        Returns:
+            scores (list): Entailment scores in the order of hypothesises for every query
+        """
+        rows, owners = self._encode_queries(queries)
+        scores = [[0.0] * len(hypothesises) for _, hypothesises in queries]
+        for row_idx, score in self._score_rows(rows, batch_size, max_tokens):
+            query_idx, idx = owners[row_idx]
+            scores[query_idx][idx] = score
+        return scores
+
+    def _encode_queries(self, queries):
+        """
+        Rows of all queries and (query index, hypothesis index) of every row
+        """
+        rows, owners = [], []
+        for query_idx, (premise, hypothesises) in enumerate(queries):
+            if not hypothesises:
+                continue
+            query_rows = self._encode_rows(premise, hypothesises)
+            rows.extend(query_rows)
+            owners.extend((query_idx, idx) for idx in range(len(query_rows)))
+        return rows, owners
+
+    def _encode_rows(self, premise, hypothesises):
+        """
+        Rows (premise ids, hypothesis ids, length of the row), all rows share the same list
+        of premise ids, so memory doesn't grow with number of hypotheses x premise length,
+        model inputs are built only for rows of the bucket being scored (see `_score_rows`)
+        """
+        hypothesises = [self.attribute_getter(hypothesis) for hypothesis in hypothesises]
+        with self._model_handle.lock, self.instrumentation.stage("nli.tokenize"):
+            premise_ids = self.tokenizer(premise, add_special_tokens=False)['input_ids']
+            hypothesis_ids = self.tokenizer(hypothesises, add_special_tokens=False)['input_ids']
+        num_special_tokens = self.tokenizer.num_special_tokens_to_add(pair=True)
+        max_length = self.tokenizer.model_max_length
+        return [
+            (premise_ids, ids, min(len(premise_ids) + len(ids) + num_special_tokens, max_length))
+            for ids in hypothesis_ids
+        ]
+
+    def _iter_buckets(self, rows, max_batch_size, max_tokens):
+        """
+        Groups rows sorted by length into buckets of at most max_batch_size rows
+        and at most max_tokens tokens after padding to the longest row of the bucket
+        Returns:
+            iterator of lists of row indexes
+        """
+        order = sorted(range(len(rows)), key=lambda idx: rows[idx][2])
+        bucket = []
+        for idx in order:
+            # rows are sorted, so the new row is the longest one in the bucket
+            length = rows[idx][2]
+            if bucket and (
+                len(bucket) >= max_batch_size
+                or (max_tokens and (len(bucket) + 1) * length > max_tokens)
+            ):
+                yield bucket
+                bucket = []
+            bucket.append(idx)
+        if bucket:
+            yield bucket
+
+    def _iter_scores(self, premise, hypothesises, max_batch_size=None, max_tokens=None):
+        """
+        Yields (index of hypothesis, score) bucket by bucket
+        """
+        if not hypothesises:
+            return
+        rows = self._encode_rows(premise, hypothesises)
+        yield from self._score_rows(rows, max_batch_size, max_tokens)
+
+    def _score_rows(self, rows, max_batch_size=None, max_tokens=None):
+        """
+        Yields (index of row, score) bucket by bucket
+        """
+        buckets = self._iter_buckets(
+            rows, max_batch_size or self.max_batch_size, max_tokens or self.max_tokens
         )
+        for bucket in buckets:
+            # the lock isn't held while the consumer processes the scores of the bucket
+            with self._model_handle.lock:
+                with self.instrumentation.stage("nli.tokenize"):
+                    features = [
+                        self.tokenizer.prepare_for_model(rows[idx][0], rows[idx][1], truncation=True)
+                        for idx in bucket
+                    ]
+                    encoded_input = self.tokenizer.pad(features, padding=True, return_tensors='pt')
+                if self.instrumentation.enabled:
+                    self.instrumentation.count("nli_tokens", encoded_input['input_ids'].numel())
+                with self.instrumentation.stage("nli.forward"):
+                    scores = self._score_encoded(encoded_input).tolist()
+            yield from zip(bucket, scores)
+
+    def _score_encoded(self, encoded_input):
+        encoded_input = encoded_input.to(self.cross_encoder.device)
         logits = self.cross_encoder(**encoded_input)[0]
         probs = self.softmax(logits)
         indexes = torch.argmax(probs, dim=1)
         weights = [self.entailment_weights[idx.item()] for idx in indexes]
-        scores = torch.max(probs, dim=1)[0] * torch.tensor(weights)
-        indexes = torch.topk(scores, k=len(hypothesises), dim=0)[1]
-        ret = [(hypothesises[idx.item()], scores[idx.item()].item()) for idx in indexes]
-        if not ret:
-            return []
-        top_k = min(top_k, len(ret))
-        return list(filter(lambda x: x[1] >= threshold, ret))[:top_k]
+        return (torch.max(probs, dim=1)[0] * torch.tensor(weights, device=probs.device)).cpu()
 
 
 if __name__ == '__main__':
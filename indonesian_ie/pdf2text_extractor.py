@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import contextlib
+import hashlib
+import io
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Optional
 
 import PyPDF2
 import pdfplumber
@@ -78,10 +85,11 @@ def remove_watermark_disclaimer(inputFile, outputFile):
     """
     removing text layer from pdf that contains the disclaimer and watermark
     only works for putusan pdf files
+    inputFile/outputFile are either paths or binary file objects (e.g. io.BytesIO),
+    the input is parsed once
     """
 
-    wmText = get_disclaimer(inputFile)
-    with open(inputFile, "rb") as f:
+    with _open_binary(inputFile, "rb") as f:
         source = PdfFileReader(f, "rb")
         output = PdfFileWriter()
 
@@ -99,25 +107,134 @@ def remove_watermark_disclaimer(inputFile, outputFile):
             page.__setitem__(NameObject('/Contents'), content)
             output.addPage(page)
 
-        with open(outputFile, "wb") as outputStream:
+        with _open_binary(outputFile, "wb") as outputStream:
             output.write(outputStream)
 
 
+def _open_binary(file, mode):
+    if hasattr(file, "read") or hasattr(file, "write"):
+        # file object is owned by the caller, so it isn't closed
+        return contextlib.nullcontext(file)
+    return open(file, mode)
+
+
 def preprocess_putusan_fn(input_file, output_file):
-    waterMarkTextStarting = 'Mahkamah Agung'
-    wm_text = watermark_text(input_file, waterMarkTextStarting)
-    # remove_watermark(wm_text, input_file, output_file)
+    # all text layers (watermark and disclaimer included) are removed at once,
+    # so the watermark text (see `watermark_text`) isn't needed
+    # remove_watermark(watermark_text(input_file, 'Mahkamah Agung'), input_file, output_file)
     remove_watermark_disclaimer(input_file, output_file)
 
 
+def iter_pages(backend, input_file, first_page=1, last_page=None):
+    """
+    Yields (page_num, text) for pages from first_page to last_page (1-based, inclusive),
+    input_file is a path or the content of PDF file (bytes)
+    """
+    if backend == 'pdfplumber':
+        with _open_pdfplumber(input_file) as pdf:
+            for page_num, page in enumerate(pdf.pages[first_page - 1 : last_page], first_page):
+                yield page_num, page.extract_text()
+    else:
+        doc = _open_fitz(input_file)
+        # metadata = doc.metadata
+        last_page = min(last_page or len(doc), len(doc))
+        for page_num in range(first_page, last_page + 1):
+            yield page_num, doc[page_num - 1].get_text()
+
+
+def _open_pdfplumber(input_file):
+    if isinstance(input_file, bytes):
+        input_file = io.BytesIO(input_file)
+    return pdfplumber.open(input_file)
+
+
+def _open_fitz(input_file):
+    import fitz
+
+    if isinstance(input_file, bytes):
+        return fitz.open(stream=input_file, filetype='pdf')
+    return fitz.open(input_file)
+
+
+def _extract_pages(backend, input_file, first_page, last_page):
+    # runs in a worker process
+    return list(iter_pages(backend, input_file, first_page, last_page))
+
+
+def _extract_file(backend, preprocess_fn, preprocess_in_memory, input_file):
+    # runs in a worker process
+    input_file = _preprocess(preprocess_fn, input_file, preprocess_in_memory)
+    return list(iter_pages(backend, input_file))
+
+
+def _preprocess(preprocess_fn, input_file, in_memory=True):
+    """
+    Returns the content of preprocessed PDF file (bytes) if in_memory,
+    otherwise the path of its preprocessed copy
+    """
+    if not preprocess_fn:
+        return input_file
+    if in_memory:
+        output = io.BytesIO()
+        preprocess_fn(input_file, output)
+        return output.getvalue()
+    input_file_preprocessed = (
+        Path(input_file).parent / f'{Path(input_file).stem}_preprocessed.pdf'
+    )
+    preprocess_fn(input_file, input_file_preprocessed)
+    return input_file_preprocessed
+
+
+def _submit_bounded(executor, fn, tasks, max_pending):
+    """
+    Submits tasks to executor keeping at most max_pending of them in flight
+    and yields their results in the order of tasks
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, *task))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 class Pdf2TextExtractor(BaseExtractor):
 
     def __init__(
-        self, backend: str, preprocess_fn: callable = preprocess_putusan_fn, **kwargs
+        self,
+        backend: str,
+        preprocess_fn: callable = preprocess_putusan_fn,
+        n_jobs: int = 1,
+        pages_per_task: int = 8,
+        max_pending_tasks: Optional[int] = None,
+        preprocess_in_memory: bool = False,
+        **kwargs
     ):
+        """
+        Args:
+            backend (str): Text extraction backend
+            preprocess_fn (callable): Preprocessing of the PDF file, (input_file, output_file) -> None,
+                output_file is a path, or a binary file object if preprocess_in_memory
+                (`preprocess_putusan_fn` supports both), it has to be picklable
+                (e.g. module-level function) if n_jobs > 1
+            n_jobs (int): Number of worker processes, pages (or files in `extract_files`)
+                are extracted in parallel if n_jobs > 1
+            pages_per_task (int): Number of pages extracted by a worker at once
+            max_pending_tasks (int): Maximal number of tasks in flight, 2 * n_jobs by default,
+                i.e. at most max_pending_tasks * pages_per_task pages are held in memory
+            preprocess_in_memory (bool): If True, the preprocessed PDF is kept in memory and passed
+                to the backend directly (to worker processes through one temporary file
+                if n_jobs > 1), otherwise it's written next to the input file with
+                `_preprocessed` suffix
+        """
         super().__init__(**kwargs)
         self.backend = backend
         self.preprocess_fn = preprocess_fn
+        self.n_jobs = n_jobs
+        self.pages_per_task = pages_per_task
+        self.max_pending_tasks = max_pending_tasks or 2 * n_jobs
+        self.preprocess_in_memory = preprocess_in_memory
 
         assert self.backend in [
             'pdfminer',
@@ -128,32 +245,82 @@ class Pdf2TextExtractor(BaseExtractor):
         ]
 
     def _extract(self, input_file, *args, **kwargs):
-        if self.preprocess_fn:
-            input_file_preprocessed = (
-                Path(input_file).parent / f'{Path(input_file).stem}_preprocessed.pdf'
-            )
-            self.preprocess_fn(input_file, input_file_preprocessed)
-            input_file = input_file_preprocessed
-        if self.backend == 'pdfplumber':
-            with pdfplumber.open(input_file) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    yield page_num, page.extract_text()
-        else:
-            import fitz
+        with self.instrumentation.stage("pdf.preprocess"):
+            input_file = _preprocess(self.preprocess_fn, input_file, self.preprocess_in_memory)
+        for page in self._iter_pages(input_file):
+            self.instrumentation.count("pages")
+            yield page
+
+    def _iter_pages(self, input_file):
+        if self.n_jobs <= 1:
+            yield from iter_pages(self.backend, input_file)
+            return
+
+        if isinstance(input_file, bytes):
+            # tasks get the path of one temporary copy instead of the whole PDF per task
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tmp_file = Path(tmp_dir) / "preprocessed.pdf"
+                tmp_file.write_bytes(input_file)
+                yield from self._iter_pages(str(tmp_file))
+            return
+
+        num_pages = self.get_num_pages(input_file)
+        tasks = (
+            (self.backend, input_file, first_page,
+             min(first_page + self.pages_per_task - 1, num_pages))
+            for first_page in range(1, num_pages + 1, self.pages_per_task)
+        )
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+            for pages in _submit_bounded(executor, _extract_pages, tasks, self.max_pending_tasks):
+                yield from pages
 
-            doc = fitz.open(input_file)
-            # metadata = doc.metadata
-            for page_num, page in enumerate(doc, 1):
-                yield page_num, page.get_text()
+    def extract_files(self, input_files: Iterable):
+        """
+        Extracts text from many PDF files, every file is preprocessed and extracted
+        by a worker process if n_jobs > 1
+        Args:
+            input_files (list): List of PDF files
+        Returns:
+            iterator of (input_file, page_num, text) in the order of files and pages
+        """
+        if self.n_jobs <= 1:
+            for input_file in input_files:
+                for page_num, text in self._extract(input_file):
+                    yield input_file, page_num, text
+            return
+
+        input_files = list(input_files)
+        tasks = (
+            (self.backend, self.preprocess_fn, self.preprocess_in_memory, input_file)
+            for input_file in input_files
+        )
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+            results = _submit_bounded(executor, _extract_file, tasks, self.max_pending_tasks)
+            for input_file, pages in zip(input_files, results):
+                self.instrumentation.count("pages", len(pages))
+                for page_num, text in pages:
+                    yield input_file, page_num, text
+
+    def cache_config(self):
+        return {
+            "backend": self.backend,
+            "preprocess_fn": getattr(self.preprocess_fn, "__qualname__", self.preprocess_fn),
+        }
+
+    def _cache_inputs(self, input_file, *args, **kwargs):
+        # results depend on the content of the file, not on its path
+        digest = hashlib.sha256()
+        with open(input_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest(), super()._cache_inputs(*args, **kwargs)
 
     def get_num_pages(self, input_file):
         if self.backend == 'pdfplumber':
-            with pdfplumber.open(input_file) as pdf:
+            with _open_pdfplumber(input_file) as pdf:
                 return len(pdf.pages)
         elif self.backend == 'pymupdf':
-            import fitz
-
-            doc = fitz.open(input_file)
+            doc = _open_fitz(input_file)
             return len(doc)
         else:
             raise NotImplementedError
@@ -2,69 +2,168 @@
 # -*- coding: utf-8 -*-
 import itertools
 
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers import AutoModelForSeq2SeqLM
 
 from indonesian_ie.base_extractor import BaseExtractor
+from indonesian_ie.model_registry import get_model_registry
 
 
 class QAExtractor(BaseExtractor):
+    cache_fields = ("model_name", "max_length", "doc_stride")
 
-    def __init__(self, model_name='bstds/id-mt5-qa', device='cpu', **kwargs):
+    def __init__(
+        self,
+        model_name='bstds/id-mt5-qa',
+        device='cpu',
+        max_length=512,
+        doc_stride=None,
+        **kwargs
+    ):
+        """
+        Args:
+            model_name (str): Seq2seq QA model name or path
+            device (str): Device of the model
+            max_length (int): Maximal number of tokens of a model input
+            doc_stride (int): Overlap of consecutive context windows in tokens. If set, contexts
+                which don't fit into max_length are split into overlapping windows answered
+                as one batch, and the answer with the best generation score is picked.
+                Otherwise the input is truncated to max_length.
+        """
         super().__init__(**kwargs)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model_name = model_name
+        self.max_length = max_length
+        self.doc_stride = doc_stride
+        # weights are shared with other extractors using the same model
+        self._model_handle = get_model_registry().acquire(
+            AutoModelForSeq2SeqLM, model_name, device=device
+        )
+        self.model = self._model_handle.model
+        self.tokenizer = self._model_handle.tokenizer
         self.qg_format = "highlight"
-        self.model.to(device)
         assert self.model.__class__.__name__ in ["T5ForConditionalGeneration"]
         self.model_type = "t5"
 
     def __call__(self, question, context, **kwargs):
-        return self._extract(question, context, **kwargs)
-
-    def _prepare_inputs(self, question, context):
-        source_text = f"question: {question}  context: {context}"
-        source_text = source_text + " </s>"
-        return source_text
+        return super().__call__(question, context, **kwargs)
 
     @property
     def device(self):
         return self.model.device
 
     def _extract(self, question, context, **kwargs):
-        source_text = self._prepare_inputs(question, context)
-        inputs = self._tokenize([source_text], padding=False)
+        with self._model_handle.lock:
+            return self._answer([question], [context], batch_size=16)[0]
+
+    def extract_batch(self, questions, contexts, batch_size=16, **kwargs):
+        """
+        Answers questions in batches, inputs are sorted by length and padded
+        to the longest input of the batch, so every batch is a single `generate` call
+        Args:
+            questions (list): List of questions
+            contexts (list or str): List of contexts (one per question) or a context shared by all questions
+            batch_size (int): Number of inputs (context windows) per `generate` call
+        Returns:
+            answers (list): Answers in the order of questions, [] if there is no answer
+        """
+        if isinstance(contexts, str):
+            contexts = [contexts] * len(questions)
+        assert len(questions) == len(contexts)
+        with self._model_handle.lock:
+            return self._answer(questions, contexts, batch_size)
+
+    def _encode(self, question, context):
+        """
+        Token ids of model inputs for the question, one per context window:
+        "question: {question}  context:" + window of the context + eos, without `doc_stride`
+        there is one window, the context truncated to `max_length`
+        """
+        prefix_ids = self.tokenizer(
+            f"question: {question}  context:", add_special_tokens=False
+        )["input_ids"]
+        context_ids = self.tokenizer(context, add_special_tokens=False)["input_ids"]
+        suffix_ids = [self.tokenizer.eos_token_id]
+        window_size = self.max_length - len(prefix_ids) - len(suffix_ids)
+        if self.doc_stride is None:
+            assert window_size > 0, "question is too long for max_length"
+            return [prefix_ids + context_ids[:window_size] + suffix_ids]
+
+        assert window_size > self.doc_stride, "question is too long for max_length and doc_stride"
+        rows = []
+        for start in range(0, max(len(context_ids) - self.doc_stride, 1), window_size - self.doc_stride):
+            rows.append(prefix_ids + context_ids[start : start + window_size] + suffix_ids)
+        return rows
+
+    def _answer(self, questions, contexts, batch_size):
+        rows, owners = [], []
+        with self.instrumentation.stage("qa.tokenize"):
+            for idx, (question, context) in enumerate(zip(questions, contexts)):
+                question_rows = self._encode(question, context)
+                rows.extend(question_rows)
+                owners.extend([idx] * len(question_rows))
+        self.instrumentation.count("qa_windows", len(rows))
+        # generation scores are needed only to pick the best window
+        with_scores = len(rows) > len(questions)
+        order = sorted(range(len(rows)), key=lambda idx: len(rows[idx]))
+
+        answers = [[] for _ in questions]
+        best_scores = [None] * len(questions)
+        for batch_start in range(0, len(order), batch_size):
+            batch_indexes = order[batch_start : batch_start + batch_size]
+            inputs = self.tokenizer.pad(
+                {"input_ids": [rows[idx] for idx in batch_indexes]},
+                padding="longest",
+                return_tensors="pt",
+            )
+            if self.instrumentation.enabled:
+                self.instrumentation.count("qa_tokens", inputs["input_ids"].numel())
+            with self.instrumentation.stage("qa.generate"):
+                if with_scores:
+                    outs, scores = self._generate_scored(inputs)
+                else:
+                    outs, scores = self._generate(inputs), [0.0] * len(batch_indexes)
+            for idx, out, score in zip(batch_indexes, outs, scores):
+                answer = self._decode_answer(out)
+                owner = owners[idx]
+                # any answer is better than no answer
+                if answer and (not answers[owner] or score > best_scores[owner]):
+                    answers[owner] = answer
+                    best_scores[owner] = score
+        return answers
+
+    def _generate(self, inputs, max_length=80):
+        return self.model.generate(
+            input_ids=inputs['input_ids'].to(self.device),
+            attention_mask=inputs['attention_mask'].to(self.device),
+            max_length=max_length,
+        )
 
+    def _generate_scored(self, inputs, max_length=80):
+        """
+        Generates answers together with their scores: mean log-probability of generated tokens
+        """
         outs = self.model.generate(
             input_ids=inputs['input_ids'].to(self.device),
             attention_mask=inputs['attention_mask'].to(self.device),
-            max_length=80,
+            max_length=max_length,
+            output_scores=True,
+            return_dict_in_generate=True,
         )
-        answers = self.tokenizer.decode(outs[0], skip_special_tokens=True)
+        transition_scores = self.model.compute_transition_scores(
+            outs.sequences, outs.scores, normalize_logits=True
+        )
+        # the first token is the decoder start token, padding follows the end of an answer
+        mask = outs.sequences[:, 1:] != self.tokenizer.pad_token_id
+        scores = (transition_scores * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return outs.sequences, scores.tolist()
+
+    def _decode_answer(self, output):
+        answers = self.tokenizer.decode(output, skip_special_tokens=True)
         flat_answers = list(itertools.chain(*answers))
 
         if len(flat_answers) == 0:
             return []
         return answers
 
-    def _tokenize(
-        self,
-        inputs,
-        padding=True,
-        truncation=True,
-        add_special_tokens=True,
-        max_length=512,
-    ):
-        inputs = self.tokenizer.batch_encode_plus(
-            inputs,
-            max_length=max_length,
-            add_special_tokens=add_special_tokens,
-            truncation=truncation,
-            padding="max_length" if padding else False,
-            pad_to_max_length=padding,
-            return_tensors="pt",
-        )
-        return inputs
-
 
 if __name__ == '__main__':
     context = "Raja Purnawarman mulai memerintah Kerajaan Tarumanegara pada tahun 395 M."
@@ -72,3 +171,7 @@ if __name__ == '__main__':
 
     extractor = QAExtractor()
     print(extractor(question, context))
+    print(extractor.extract_batch([question, "Kapan Raja Purnawarman mulai memerintah?"], context))
+
+    extractor = QAExtractor(doc_stride=128)
+    print(extractor(question, " ".join([context] * 200)))
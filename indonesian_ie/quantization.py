@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dynamically int8-quantized CPU backend for transformer models
+
+Linear layers are quantized with `torch.quantization.quantize_dynamic`, the state dict of the quantized
+model is saved once to `~/.cache/indonesian_ie/models` and loaded from there next time. The file name
+includes the checkpoint revision, hash of the model config, `from_pretrained` kwargs and torch version,
+so an updated checkpoint or another torch never loads a stale artifact.
+`compare_backends` reports accuracy drift and speedup of the quantized model against the eager one,
+so the backend can be switched per model (`quantization="int8"` of extractors).
+"""
+import hashlib
+import json
+import pickle
+import re
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+import torch
+
+DEFAULT_MODELS_DIR = Path.home() / ".cache" / "indonesian_ie" / "models"
+
+
+def quantize_model(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def artifact_path(
+    model_cls, model_name: str, config, models_dir=DEFAULT_MODELS_DIR, **kwargs
+) -> Path:
+    """
+    Path of the quantized state dict of the model
+    Args:
+        model_cls: Model class, e.g. `AutoModelForTokenClassification`
+        model_name (str): Model name or path
+        config: Config of the model (`AutoConfig.from_pretrained`)
+        models_dir (str): Directory of quantized models
+        kwargs: Keyword arguments of `model_cls.from_pretrained`
+    """
+    fingerprint = json.dumps({
+        "revision": getattr(config, "_commit_hash", None),
+        "config": config.to_json_string(),
+        "kwargs": sorted((name, repr(value)) for name, value in kwargs.items()),
+        "torch": torch.__version__,
+    }, sort_keys=True)
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+    safe_name = re.sub(r"[^\w.-]+", "--", f"{model_cls.__qualname__}--{model_name}")
+    return Path(models_dir).expanduser() / f"{safe_name}-int8-{digest}.pt"
+
+
+def load_quantized(model_cls, model_name: str, models_dir=DEFAULT_MODELS_DIR, **kwargs):
+    """
+    Loads int8-quantized model: the model is built from its config, quantized and its quantized
+    state dict is loaded from `models_dir`. If there is no saved state dict (or it can't be loaded),
+    pretrained weights are quantized and the state dict is saved.
+    Args:
+        model_cls: Model class, e.g. `AutoModelForTokenClassification`
+        model_name (str): Model name or path
+        models_dir (str): Directory of quantized models
+        kwargs: Keyword arguments of `model_cls.from_pretrained`
+    Returns:
+        model: Quantized model (CPU only)
+    """
+    from transformers import AutoConfig
+
+    # config kwargs (e.g. num_labels) are applied to the config, hub kwargs (e.g. revision)
+    # are used to download it
+    config, unused_kwargs = AutoConfig.from_pretrained(
+        model_name, return_unused_kwargs=True, **kwargs
+    )
+    path = artifact_path(model_cls, model_name, config, models_dir, **kwargs)
+    if path.exists():
+        model_kwargs = {}
+        if unused_kwargs.get("torch_dtype") is not None:
+            model_kwargs["torch_dtype"] = unused_kwargs["torch_dtype"]
+        model = quantize_model(model_cls.from_config(config, **model_kwargs).eval())
+        try:
+            model.load_state_dict(torch.load(path, weights_only=True))
+            return model
+        except (RuntimeError, pickle.UnpicklingError):
+            # incompatible artifact, it's quantized again
+            pass
+    model = model_cls.from_pretrained(model_name, **kwargs)
+    model.eval()
+    model = quantize_model(model)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    torch.save(model.state_dict(), tmp_path)
+    tmp_path.replace(path)
+    return model
+
+
+@torch.inference_mode()
+def _run(model, encoded_input, repeat):
+    outputs = model(**encoded_input)[0]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model(**encoded_input)
+    return outputs, (time.perf_counter() - start) / repeat
+
+
+def compare_backends(
+    model_cls,
+    model_name: str,
+    texts: Sequence[str],
+    text_pairs: Optional[Sequence[str]] = None,
+    repeat: int = 3,
+) -> dict:
+    """
+    Compares int8-quantized model against the eager one on the same inputs
+    Args:
+        model_cls: Model class, e.g. `AutoModelForSequenceClassification`
+        model_name (str): Model name or path
+        texts (list): Input texts
+        text_pairs (list): Second texts of pairs, e.g. hypotheses for NLI model
+        repeat (int): Number of timed forward passes
+    Returns:
+        report (dict): Timings, speedup and drift of the first output (logits) of the model
+    """
+    from indonesian_ie.model_registry import get_model_registry
+
+    registry = get_model_registry()
+    eager = registry.acquire(model_cls, model_name)
+    quantized = registry.acquire(model_cls, model_name, quantization="int8")
+    encoded_input = eager.tokenizer(
+        list(texts),
+        list(text_pairs) if text_pairs is not None else None,
+        padding=True,
+        truncation=True,
+        return_tensors="pt",
+    )
+    eager_logits, eager_time = _run(eager.model, encoded_input, repeat)
+    quantized_logits, quantized_time = _run(quantized.model, encoded_input, repeat)
+    diff = (eager_logits - quantized_logits).abs()
+    return {
+        "model_name": model_name,
+        "eager_time": eager_time,
+        "int8_time": quantized_time,
+        "speedup": eager_time / quantized_time,
+        "max_abs_diff": diff.max().item(),
+        "mean_abs_diff": diff.mean().item(),
+        "argmax_agreement": (
+            eager_logits.argmax(dim=-1) == quantized_logits.argmax(dim=-1)
+        ).float().mean().item(),
+    }
+
+
+if __name__ == '__main__':
+    from pprint import pprint
+
+    from transformers import (
+        AutoModelForQuestionAnswering,
+        AutoModelForSequenceClassification,
+        AutoModelForTokenClassification,
+    )
+
+    texts = [
+        "Demikianlah diputuskan dalam rapat permusyawaratan Majelis Hakim pada hari Kamis, "
+        "tanggal 22 Desember 2022, oleh Dr. Irfan Fachruddin, S.H., C.N.",
+        "Raja Purnawarman mulai memerintah Kerajaan Tarumanegara pada tahun 395 M.",
+    ]
+    pprint(compare_backends(AutoModelForTokenClassification, "bstds/id-roberta-ner", texts))
+    pprint(compare_backends(
+        AutoModelForSequenceClassification,
+        "w11wo/indonesian-roberta-base-indonli",
+        texts,
+        ["Irfan Fachruddin adalah hakim.", "Purnawarman adalah raja."],
+    ))
+    pprint(compare_backends(
+        AutoModelForQuestionAnswering,
+        "bstds/id-extractive-bert-squad",
+        ["Siapa ketua majelis?", "Siapa pemimpin Kerajaan Tarumanegara?"],
+        texts,
+    ))
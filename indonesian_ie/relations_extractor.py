@@ -4,9 +4,13 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Optional
 
 from indonesian_ie.base_extractor import BaseExtractor
+from indonesian_ie.mention_collection import MentionCollection, iter_pair_indexes
 from indonesian_ie.mentions_extractor import MentionExtractor
 from indonesian_ie.nli_reranker import CrossEncoderEntailmentReranker
 from indonesian_ie.qa_extractor import QAExtractor
+from indonesian_ie.sentence_splitter import LegalSentenceSplitter
+
+_sentence_splitter = LegalSentenceSplitter()
 
 
 DEFAULT_NLI_RELATION_PATTERNS = {
@@ -170,13 +174,31 @@ class RelationsQAExtractor(BaseExtractor):
     Extracts relations between entities from text
     based on QA patterns and dictionary of relations
     """
+    cache_fields = ("relations_patterns", "max_distance", "max_sentence_distance")
 
     def __init__(self,
                  relations_patterns: Optional[Dict] = None,
                  n_jobs: int = 1,
+                 batch_size: Optional[int] = None,
+                 max_distance: Optional[int] = None,
+                 max_sentence_distance: Optional[int] = None,
                  **kwargs):
+        """
+        Args:
+            relations_patterns (dict): Dict of QA patterns where key is (subject type, object type)
+            n_jobs (int): Number of threads extracting relations for mention pairs
+            batch_size (int): If set, questions for all mention pairs of a document are
+                answered in batches of this size instead of using threads
+            max_distance (int): If set, only mentions at most this number of characters apart
+                are paired
+            max_sentence_distance (int): If set, only mentions at most this number of sentences
+                apart are paired, 0 means the same sentence
+        """
         super().__init__(**kwargs)
         self.n_jobs = n_jobs
+        self.batch_size = batch_size
+        self.max_distance = max_distance
+        self.max_sentence_distance = max_sentence_distance
         self._mentions_extractor = None
         self._qa_extractor = None
         # list of patterns for relations between entities with QA prompts
@@ -228,15 +250,25 @@ class RelationsQAExtractor(BaseExtractor):
     @property
     def mentions_extractor(self):
         if not self._mentions_extractor:
-            self._mentions_extractor = MentionExtractor()
+            self._mentions_extractor = MentionExtractor(instrumentation=self.instrumentation)
         return self._mentions_extractor
 
     @property
     def qa_extractor(self):
         if not self._qa_extractor:
-            self._qa_extractor = QAExtractor()
+            self._qa_extractor = QAExtractor(instrumentation=self.instrumentation)
         return self._qa_extractor
 
+    def cache_config(self):
+        # results depend on the models of sub-extractors as well
+        config = super().cache_config()
+        config["mentions_extractor"] = sorted(self.mentions_extractor.cache_config().items())
+        config.update(self._relations_model_config())
+        return config
+
+    def _relations_model_config(self):
+        return {"qa_extractor": sorted(self.qa_extractor.cache_config().items())}
+
     def _extract(self, text, *args, **kwargs):
         """
         Extracts relations between entities from text
@@ -249,23 +281,119 @@ class RelationsQAExtractor(BaseExtractor):
         """
         Extracts relations between entities from mentions
         where mentions is a list of entities with their start and end index and entity type
+        (or `MentionCollection`)
         """
-        relations = []
-        def _iter_pairs():
-            for subject in mentions:
-                for object in mentions:
-                    if subject != object and subject["word"].strip() != object["word"].strip():
-                        yield subject, object
-
-        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
-            futures = [executor.submit(self._extract_relation, subject, object, context)
-                       for subject, object in _iter_pairs()]
-            for future in as_completed(futures):
-                relation = future.result()
-                if relation:
-                    relations.append(relation)
+        return self.from_pairs(self._iter_pairs(mentions, context), context)
+
+    def from_pairs(self, pairs, context):
+        """
+        Extracts relations for candidate (subject, object) pairs of mentions
+        """
+        with self.instrumentation.stage("relations.pairs"):
+            pairs = list(pairs)
+        self.instrumentation.count("pairs", len(pairs))
+        if self.batch_size:
+            relations = self._extract_relations_batched(pairs, context)
+        else:
+            relations = []
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                futures = [executor.submit(self._extract_relation, subject, object, context)
+                           for subject, object in pairs]
+                for future in as_completed(futures):
+                    relation = future.result()
+                    if relation:
+                        relations.append(relation)
+        self.instrumentation.count("relations", len(relations))
         return relations
 
+    def _pair_types(self):
+        """
+        (subject type, object type) combinations which have patterns
+        """
+        return list(self.relations_patterns)
+
+    def _sentence_starts(self, context):
+        return [0] + _sentence_splitter.boundaries(context)
+
+    def _iter_pairs(self, mentions, context=None):
+        """
+        Generates candidate (subject, object) pairs of mention dicts, see `iter_pair_indexes`
+        """
+        if isinstance(mentions, MentionCollection):
+            collection, mentions = mentions, mentions.to_dicts()
+        else:
+            mentions = list(mentions)
+            collection = MentionCollection.from_dicts(mentions)
+        for subject_idx, object_idx in self.iter_pair_indexes(collection, context):
+            yield mentions[subject_idx], mentions[object_idx]
+
+    def iter_pair_indexes(self, mentions, context=None, max_distance=None, new_from=0):
+        """
+        Generates candidate (subject index, object index) pairs of `MentionCollection`:
+        only pairs of types from `_pair_types` are generated, and pairs further than
+        `max_distance`/`max_sentence_distance` are skipped with binary search
+        Args:
+            mentions (MentionCollection): Mentions
+            context (str): Text of mentions, required for `max_sentence_distance`
+            max_distance (int): If set, overrides `max_distance` of the extractor
+            new_from (int): Only pairs with at least one mention at index >= new_from are generated
+        """
+        sentence_starts = None
+        if self.max_sentence_distance is not None and context:
+            sentence_starts = self._sentence_starts(context)
+        return iter_pair_indexes(
+            mentions,
+            self._pair_types(),
+            max_distance=self.max_distance if max_distance is None else max_distance,
+            sentence_starts=sentence_starts,
+            max_sentence_distance=self.max_sentence_distance,
+            new_from=new_from,
+        )
+
+    def _extract_relations_batched(self, pairs, context):
+        """
+        Extracts relations for all mention pairs of a document with batched QA:
+        the i-th pattern is asked in one `extract_batch` call for all pairs
+        which weren't answered by the previous patterns, so the first pattern that answers wins
+        as in `_extract_relation` and the number of rounds is bounded by the number of patterns
+        """
+        relations = [None] * len(pairs)
+        pending = [
+            idx for idx, (subject, object) in enumerate(pairs)
+            if (subject["entity_group"], object["entity_group"]) in self.relations_patterns
+        ]
+        pattern_idx = 0
+        while pending:
+            questions = {}
+            for idx in pending:
+                subject, object = pairs[idx]
+                patterns = self.relations_patterns[(subject["entity_group"], object["entity_group"])]
+                if pattern_idx < len(patterns):
+                    questions[idx] = patterns[pattern_idx].format(subject=subject["word"],
+                                                                  object=object["word"])
+            if not questions:
+                break
+            # the same question is built for different mentions with the same word
+            unique_questions = list(dict.fromkeys(questions.values()))
+            self.instrumentation.count("questions", len(unique_questions))
+            unique_answers = self.qa_extractor.extract_batch(unique_questions, context,
+                                                             batch_size=self.batch_size)
+            answers = dict(zip(unique_questions, unique_answers))
+            pending = []
+            for idx, question in questions.items():
+                answer = answers[question]
+                if answer:
+                    subject, object = pairs[idx]
+                    relations[idx] = {
+                        "subject": subject,
+                        "object": object,
+                        "relation": answer,
+                    }
+                else:
+                    pending.append(idx)
+            pattern_idx += 1
+        return [relation for relation in relations if relation]
+
     def _extract_relation(self, subject, object, context):
         """
         Extracts relation between two entities
@@ -313,7 +441,20 @@ class RelationsNLIExtractor(RelationsQAExtractor):
     def __init__(self, n_jobs=1, **kwargs):
         super().__init__(n_jobs=n_jobs, **kwargs)
         self.relations_patterns = DEFAULT_NLI_RELATION_PATTERNS
-        self.nli_retriever = CrossEncoderEntailmentReranker(attribute_getter=lambda x: x["hypothesis"])
+        self.nli_retriever = CrossEncoderEntailmentReranker(
+            attribute_getter=lambda x: x["hypothesis"], instrumentation=self.instrumentation
+        )
+
+    def _relations_model_config(self):
+        return {
+            "nli_model": self.nli_retriever.model_name_or_path,
+            "nli_quantization": self.nli_retriever.quantization,
+        }
+
+    def _pair_types(self):
+        return list(dict.fromkeys(
+            pair_type for patterns in self.relations_patterns.values() for pair_type in patterns
+        ))
 
     def _extract_relation(self, subject, object, context):
         hypothesises = self._generate_hypotheses(subject, object)
@@ -331,6 +472,86 @@ class RelationsNLIExtractor(RelationsQAExtractor):
             relation = None
         return relation
 
+    def _extract_relations_batched(self, pairs, context, threshold=0.6):
+        """
+        Extracts relations for all mention pairs of a document at once:
+        hypotheses of all pairs are scored against the document in length-sorted batches
+        and the best hypothesis is picked per pair
+        """
+        pairs_hypotheses, unique_hypotheses = self._hypotheses_for_pairs(pairs)
+        unique_scores = self.nli_retriever.score(
+            premise=context,
+            hypothesises=[{"hypothesis": hypothesis} for hypothesis in unique_hypotheses],
+            batch_size=self.batch_size,
+        )
+        return self._pick_relations(
+            pairs_hypotheses, dict(zip(unique_hypotheses, unique_scores)), threshold
+        )
+
+    def extract_many(self, texts, threshold=0.6):
+        """
+        Extracts relations from many texts at once: mentions of all texts are extracted
+        in shared NER batches and hypotheses of all texts are scored in shared NLI batches,
+        results are not cached
+        Args:
+            texts (list): List of texts
+            threshold (float): Minimal score of a relation
+        Returns:
+            relations (list): Relations of every text
+        """
+        texts = list(texts)
+        prepared = []
+        for text, mentions in zip(texts, self.mentions_extractor.extract_many(texts)):
+            with self.instrumentation.stage("relations.pairs"):
+                pairs = list(self._iter_pairs(mentions, text))
+            self.instrumentation.count("pairs", len(pairs))
+            prepared.append(self._hypotheses_for_pairs(pairs))
+        scores = self.nli_retriever.score_many(
+            [
+                (text, [{"hypothesis": hypothesis} for hypothesis in unique_hypotheses])
+                for text, (_, unique_hypotheses) in zip(texts, prepared)
+            ],
+            batch_size=self.batch_size,
+        )
+        relations = [
+            self._pick_relations(
+                pairs_hypotheses, dict(zip(unique_hypotheses, text_scores)), threshold
+            )
+            for (pairs_hypotheses, unique_hypotheses), text_scores in zip(prepared, scores)
+        ]
+        self.instrumentation.count(
+            "relations", sum(len(text_relations) for text_relations in relations)
+        )
+        return relations
+
+    def _hypotheses_for_pairs(self, pairs):
+        """
+        Hypotheses of every pair and unique texts of all hypotheses
+        """
+        pairs_hypotheses = [self._generate_hypotheses(subject, object) for subject, object in pairs]
+        # the same hypothesis is built for different mentions with the same word
+        unique_hypotheses = list(dict.fromkeys(
+            hypothesis["hypothesis"] for hypotheses in pairs_hypotheses for hypothesis in hypotheses
+        ))
+        self.instrumentation.count("hypotheses", len(unique_hypotheses))
+        return pairs_hypotheses, unique_hypotheses
+
+    def _pick_relations(self, pairs_hypotheses, scores, threshold):
+        relations = []
+        for hypotheses in pairs_hypotheses:
+            if not hypotheses:
+                continue
+            best_hypothesis = max(hypotheses, key=lambda x: scores[x["hypothesis"]])
+            score = scores[best_hypothesis["hypothesis"]]
+            if score >= threshold:
+                relations.append({
+                    "relation": best_hypothesis["relation"],
+                    "score": score,
+                    "subject": best_hypothesis["subject"],
+                    "object": best_hypothesis["object"],
+                })
+        return relations
+
     def _generate_hypotheses(self, subject, object):
         hypotheses = []
         subject_type = subject["entity_group"]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "indonesian_ie"
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of extractors results
+
+    Results are pickled into `cache_dir/<key>.pkl`, where key is a hash of the input content,
+    extractor class and config (e.g. model name) and package version, see `BaseExtractor.cache_key`.
+    When the total size of stored results exceeds `max_size` bytes, least recently used results
+    are evicted, the order of use is kept in files modification time, so it survives restarts.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size: int = 2 ** 30):
+        """
+        Args:
+            cache_dir (str): Directory of the cache
+            max_size (int): Maximal total size of stored results in bytes
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = self._load_entries()
+        self._size = sum(self._entries.values())
+
+    def _load_entries(self):
+        # key -> size, from least to most recently used
+        paths = sorted(self.cache_dir.glob("*.pkl"), key=lambda x: x.stat().st_mtime)
+        return OrderedDict((path.stem, path.stat().st_size) for path in paths)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Hashes parts (bytes are hashed as is, other parts by their repr) into a key
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = repr(part).encode("utf-8")
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self._size -= self._entries.pop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def put(self, key: str, value: Any):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            # write into temporary file first, so readers never see partial results
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_size and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_size": self.max_size,
+        }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rule-based sentence splitter for Indonesian legal texts (putusan)
+
+A lightweight alternative of `MorphSentenceTokenizer(mode="sentence")`: candidate boundaries
+(sentence-final punctuation followed by whitespace) are found by one compiled regex and rejected
+by abbreviation (titles, academic degrees, "ttd.", ...) and number (list enumerators) rules,
+no model is loaded.
+"""
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+# abbreviations which don't end a sentence, lowercased without the final period,
+# dotted ones (e.g. "S.H.", "C.N.") and initials (e.g. "H.") are matched by rules
+DEFAULT_ABBREVIATIONS = frozenset([
+    # titles
+    "dr", "drs", "dra", "ir", "prof", "hj", "bpk", "sdr", "sdri", "tn", "ny", "nn", "mr", "mrs",
+    # academic degrees
+    "sh", "mh", "se", "mm", "ak", "kn", "mkn", "msi", "mhum", "ssos", "spd", "skom", "llm",
+    # signatures, references and addresses
+    "ttd", "no", "nomor", "reg", "put", "jo", "hal", "hlm", "tgl", "jl", "jln", "kec", "kab",
+    "kel", "prov", "rt", "rw", "km", "nip", "nrp", "nik", "yth", "an", "up",
+    # money and companies
+    "rp", "pt", "cv", "tbk", "ltd", "inc", "co", "vs",
+])
+
+_CANDIDATE_RE = re.compile(
+    r"(?P<word>\S*?)(?P<term>[.!?]+)(?P<close>[\"'”’)\]]*)(?P<space>\s+)"
+)
+# "...;\n2. Menghukum", "...;\nMenimbang" - items of enumerations (e.g. the verdict)
+# and clauses ending with a semicolon at the end of a line are sentences
+_ENUMERATION_RE = re.compile(r"[;:][ \t]*\n(?=[ \t]*(?:(?:\d{1,3}|[a-z])[.)][ \t]|[A-Z]))")
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n")
+_DOTTED_ABBREVIATION_RE = re.compile(r"^(?:[a-z]{1,3}\.)+[a-z]{1,4}$|^[a-z]$")
+_WORD_STRIP = "([\"'“‘"
+
+
+class LegalSentenceSplitter:
+    """
+    Splits text into sentences, returns character offsets (see `spans`) or sentences
+
+    Usage:
+        splitter = LegalSentenceSplitter()
+        splitter("Oleh Dr. Irfan Fachruddin, S.H., C.N. sebagai Ketua Majelis. Putusan diucapkan.")
+    """
+
+    def __init__(self, abbreviations: Iterable[str] = DEFAULT_ABBREVIATIONS):
+        """
+        Args:
+            abbreviations (list): Lowercased abbreviations without the final period
+                which don't end a sentence
+        """
+        self.abbreviations = frozenset(
+            abbreviation.lower().rstrip(".") for abbreviation in abbreviations
+        )
+
+    def __call__(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.spans(text)]
+
+    def pipe(self, texts: Iterable[str]) -> Iterator[List[str]]:
+        for text in texts:
+            yield self(text)
+
+    def _is_abbreviation(self, word):
+        word = word.lstrip(_WORD_STRIP).lower()
+        return (
+            word in self.abbreviations
+            or word.replace(".", "") in self.abbreviations
+            or _DOTTED_ABBREVIATION_RE.match(word) is not None
+        )
+
+    def _is_boundary(self, text, match):
+        if _PARAGRAPH_RE.search(match["space"]):
+            return True
+        end = match.end()
+        if end < len(text) and text[end].islower():
+            return False
+        if "!" in match["term"] or "?" in match["term"]:
+            return True
+        word = match["word"]
+        if self._is_abbreviation(word):
+            return False
+        # enumerator at the start of a line, e.g. "1. Menolak ..."
+        if word.isdigit() and (match.start() == 0 or text[match.start() - 1] == "\n"):
+            return False
+        return True
+
+    def boundaries(self, text: str) -> List[int]:
+        """
+        Offsets where sentences start (except the first one)
+        """
+        boundaries = {match.end() for match in _PARAGRAPH_RE.finditer(text)}
+        boundaries.update(match.end() for match in _ENUMERATION_RE.finditer(text))
+        for match in _CANDIDATE_RE.finditer(text):
+            if self._is_boundary(text, match):
+                boundaries.add(match.end())
+        return sorted(boundary for boundary in boundaries if boundary < len(text))
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Returns (start, end) offsets of sentences, whitespaces around sentences are excluded
+        """
+        spans = []
+        starts = [0] + self.boundaries(text)
+        ends = starts[1:] + [len(text)]
+        for start, end in zip(starts, ends):
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start < end:
+                spans.append((start, end))
+        return spans
+
+
+if __name__ == '__main__':
+    text = """MENGADILI:
+1. Menolak permohonan peninjauan kembali dari Pemohon Peninjauan
+Kembali UMARDANI SUAT;
+2. Menghukum Pemohon Peninjauan Kembali membayar biaya perkara
+pada peninjauan kembali sejumlah Rp2.500.000,00 (dua juta lima ratus
+ribu Rupiah);
+Demikianlah diputuskan dalam rapat permusyawaratan Majelis Hakim
+pada hari Kamis, tanggal 22 Desember 2022, oleh Dr. Irfan Fachruddin, S.H.,
+C.N., Hakim Agung yang ditetapkan oleh Ketua Mahkamah Agung sebagai
+Ketua Majelis, bersama-sama dengan Dr. Cerah Bangun, S.H., M.H. dan Dr.
+H. Yodi Martono Wahyunadi, S.H., M.H., Hakim-Hakim Agung sebagai
+Anggota. Putusan diucapkan dalam sidang terbuka untuk umum."""
+    for sentence in LegalSentenceSplitter()(text):
+        print(repr(sentence))
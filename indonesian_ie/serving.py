@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio front end coalescing concurrent requests into micro-batches
+
+Requests to a model are queued, a worker takes the first queued request and waits at most
+`max_wait` seconds for more of them (up to `max_batch_size`), then the whole micro-batch is run
+by one call of the batch function (e.g. `MentionExtractor.extract_many`) in a dedicated executor,
+so the event loop isn't blocked by inference and the next batch is collected meanwhile.
+"""
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class MicroBatcher:
+    """
+    Queue of requests of one model coalesced into micro-batches under max-wait/max-batch policy
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List], Sequence],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        executor=None,
+    ):
+        """
+        Args:
+            batch_fn (callable): Takes a list of requests and returns a list of results
+                (one per request), runs in the executor
+            max_batch_size (int): Maximal number of requests in a micro-batch
+            max_wait (float): Maximal time in seconds the first request of a micro-batch waits
+                for other requests
+            executor (Executor): Executor running batch_fn, a dedicated single-thread executor
+                if None
+        """
+        assert max_batch_size > 0
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._executor = executor
+        self._own_executor = executor is None
+        self._queue = None
+        self._worker = None
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.inference_time = 0.0
+        self.batch_sizes = Counter()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """
+        Starts the worker in the running event loop, called by the first `submit`
+        """
+        if self._worker is not None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batcher")
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, request: Any) -> Any:
+        """
+        Queues the request and waits for its result
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((request, future))
+        self.requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        # requests of clients which gave up waiting aren't run
+        return [(request, future) for request, future in batch if not future.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.batches += 1
+            self.batch_sizes[len(batch)] += 1
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.batch_fn, [request for request, _ in batch]
+                )
+                if len(results) != len(batch):
+                    raise ValueError(
+                        f"batch function returned {len(results)} results for {len(batch)} requests"
+                    )
+            except Exception as e:
+                self.errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.inference_time += time.perf_counter() - start
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        """
+        Stops the worker, pending requests are cancelled
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_size": sum(
+                size * count for size, count in self.batch_sizes.items()
+            ) / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "inference_time": self.inference_time,
+        }
+
+
+def extractor_batch_fn(extractor) -> Callable[[List], List]:
+    """
+    Batch function of an extractor: `extract_many` if the extractor has it
+    (e.g. `MentionExtractor`, `RelationsNLIExtractor`), otherwise the extractor is called
+    for every request in turn
+    """
+    extract_many = getattr(extractor, "extract_many", None)
+    if extract_many is not None:
+        return extract_many
+    return lambda requests: [extractor(request) for request in requests]
+
+
+class InferenceServer:
+    """
+    Front end of many models, every model has its own queue and micro-batcher
+
+    Usage:
+        server = InferenceServer()
+        server.register_extractor("mentions", MentionExtractor())
+        mentions = await server.submit("mentions", text)
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait: float = 0.005):
+        """
+        Args:
+            max_batch_size (int): Default maximal number of requests in a micro-batch
+            max_wait (float): Default maximal wait for a micro-batch in seconds
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batchers: Dict[str, MicroBatcher] = {}
+
+    def register(
+        self,
+        name: str,
+        batch_fn: Callable[[List], Sequence],
+        max_batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        executor=None,
+    ) -> MicroBatcher:
+        assert name not in self.batchers, f"model {name} is already registered"
+        self.batchers[name] = MicroBatcher(
+            batch_fn,
+            max_batch_size=max_batch_size or self.max_batch_size,
+            max_wait=self.max_wait if max_wait is None else max_wait,
+            executor=executor,
+        )
+        return self.batchers[name]
+
+    def register_extractor(self, name: str, extractor, **kwargs) -> MicroBatcher:
+        return self.register(name, extractor_batch_fn(extractor), **kwargs)
+
+    async def submit(self, name: str, request: Any) -> Any:
+        return await self.batchers[name].submit(request)
+
+    def stats(self) -> dict:
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+    async def close(self):
+        for batcher in self.batchers.values():
+            await batcher.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+if __name__ == '__main__':
+    from pprint import pprint
+
+    def stub_model(texts):
+        # cost of a forward pass grows slower than the batch size
+        time.sleep(0.01 + 0.001 * len(texts))
+        return [len(text) for text in texts]
+
+    async def main():
+        async with InferenceServer(max_batch_size=16, max_wait=0.002) as server:
+            server.register("stub", stub_model)
+            start = time.perf_counter()
+            results = await asyncio.gather(*(server.submit("stub", "x" * i) for i in range(200)))
+            assert results == list(range(200))
+            print(f"200 requests in {time.perf_counter() - start:.3f}s")
+            pprint(server.stats())
+
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sorted index over spans (entities/mentions with "start" and "end" offsets)
+shared by the rule-based extractor and the mentions extractor
+
+Priority policy of `resolve_overlapping_spans`:
+* spans overlap if they share at least one offset, touching spans (end of one == start
+  of another) are considered overlapping as well (inclusive ends, e.g. regexp entities),
+  unless `touching=False` is passed (exclusive ends, e.g. dictionary matches)
+* a span with higher priority always wins over an overlapping span with lower priority
+* among overlapping spans with the same priority the one which comes first in the input wins
+* resolved spans never overlap and are returned sorted by start
+"""
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List
+
+
+class SpanIndex:
+    """
+    Index of spans sorted by start with prefix maximum of ends,
+    answers overlap and containment queries in O(log n)
+    """
+
+    def __init__(self, spans: Iterable[Dict] = ()):
+        self.spans = sorted(spans, key=lambda x: (x["start"], x["end"]))
+        self._starts = [span["start"] for span in self.spans]
+        self._max_ends = []
+        for span in self.spans:
+            end = span["end"]
+            if self._max_ends and self._max_ends[-1] > end:
+                end = self._max_ends[-1]
+            self._max_ends.append(end)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def add(self, span: Dict):
+        """
+        Adds span to the index, it's O(log n) search plus O(n) list insertion,
+        prefix maximums are updated in O(1) when indexed spans don't overlap
+        Args:
+            span (dict): Span to add
+        """
+        start, end = span["start"], span["end"]
+        pos = bisect_right(self._starts, start)
+        self._starts.insert(pos, start)
+        self.spans.insert(pos, span)
+        max_end = end
+        if pos and self._max_ends[pos - 1] > max_end:
+            max_end = self._max_ends[pos - 1]
+        self._max_ends.insert(pos, max_end)
+        pos += 1
+        while pos < len(self._max_ends) and self._max_ends[pos] < max_end:
+            self._max_ends[pos] = max_end
+            pos += 1
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """
+        Checks if any indexed span overlaps or touches [start, end]
+        """
+        pos = bisect_right(self._starts, end)
+        return pos > 0 and self._max_ends[pos - 1] >= start
+
+    def contains(self, start: int, end: int) -> bool:
+        """
+        Checks if any indexed span contains [start, end]
+        """
+        pos = bisect_right(self._starts, start)
+        return pos > 0 and self._max_ends[pos - 1] >= end
+
+
+def resolve_overlapping_spans(
+    spans: Iterable[Dict], priority_fn: Callable[[Dict], int], touching: bool = True
+) -> List[Dict]:
+    """
+    Resolves overlapping spans following the priority policy of this module
+    in O(n log n), accepted spans are kept in a Fenwick tree of maximum ends
+    over the sorted starts of all spans
+    Args:
+        spans (list): List of spans in the order of precedence for the same priority
+        priority_fn (callable): Returns the priority of a span
+        touching (bool): If True, touching spans overlap, otherwise only spans sharing
+            at least one character (`start < other_end`) overlap
+    Returns:
+        spans (list): List of non overlapping spans sorted by start
+    """
+    # stable sort keeps input order for the same priority
+    candidates = sorted(spans, key=lambda x: -priority_fn(x))
+    starts = sorted(span["start"] for span in candidates)
+    # 1-based Fenwick tree, tree[i] is the maximum end of accepted spans in its range of starts
+    tree = [None] * (len(starts) + 1)
+    resolved = []
+    for span in candidates:
+        start, end = span["start"], span["end"]
+        # maximum end of accepted spans starting before (or at) the end of the span
+        pos = bisect_right(starts, end) if touching else bisect_left(starts, end)
+        max_end = None
+        while pos > 0:
+            if tree[pos] is not None and (max_end is None or tree[pos] > max_end):
+                max_end = tree[pos]
+            pos -= pos & -pos
+        if max_end is not None and (max_end >= start if touching else max_end > start):
+            continue
+        resolved.append(span)
+        pos = bisect_right(starts, start)
+        while pos < len(tree):
+            if tree[pos] is None or tree[pos] < end:
+                tree[pos] = end
+            pos += pos & -pos
+    # resolved spans don't overlap, so their starts are unique
+    return sorted(resolved, key=lambda x: x["start"])
+
+
+def filter_contained_spans(spans: Iterable[Dict], container_spans: Iterable[Dict]) -> List[Dict]:
+    """
+    Keeps spans which aren't contained in any of container spans
+    Args:
+        spans (list): List of spans to filter
+        container_spans (list): List of spans to check containment against
+    Returns:
+        spans (list): List of spans not contained in container spans
+    """
+    index = SpanIndex(container_spans)
+    return [span for span in spans if not index.contains(span["start"], span["end"])]
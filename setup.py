@@ -32,7 +32,7 @@ setup(
         'Programming Language :: Python :: 3.10',
         'Topic :: Scientific/Engineering',
     ],
-    packages=find_packages(exclude=['tests*', 'scripts', 'utils']),
+    packages=find_packages(exclude=['tests*', 'benchmarks*', 'scripts', 'utils']),
     include_package_data=True,
     install_requires=read_requirements(HERE / 'requirements.txt'),
 )